@@ -12,7 +12,13 @@ from fastapi import (
     status,
     BackgroundTasks,
 )
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 from typing import Optional
 from twilio.rest import Client
@@ -24,9 +30,46 @@ import time
 import redis
 from datetime import datetime
 
-from openai import OpenAI
-from qdrant_client import QdrantClient
 from src.assets.prompts import DEFAULT_INTRO, SYSTEM_MESSAGE
+from src.utils.clients import ClientRegistry
+from src.utils.semantic_cache import SemanticCache
+from src.utils.local_index import load_or_build
+from src.utils.lexical_index import load_or_build as load_or_build_lexical
+from src.utils.lexical_index import reciprocal_rank_fusion
+from src.utils.rerank import select_context
+from src.utils.history_window import build_rollup_prompt, select_window
+from src.utils.session_store import InMemorySessionStore, RedisSessionStore
+from src.utils.audio_assets import AudioCue, stream_cue
+from src.utils.audio_queue import AudioQueue
+from src.utils.greeting_cache import GreetingCache
+from src.utils.embedding_cache import DEFAULT_SQLITE_PATH, EmbeddingCache
+from src.utils.pdf_cache import PDFCache, etag_matches, summary_digest
+from src.utils.pdf_generate import LOGO_PATH, create_medical_pdf
+from src.utils.latency import LatencyRecorder
+from src.utils.access import secrets_match, sign_session_token, verify_session_token
+from src.utils.realtime_pool import RealtimeSessionPool
+from src.utils.media_relay import (
+    extract_audio_delta,
+    extract_media_payload,
+    loads,
+    openai_audio_append,
+    twilio_media_frame,
+)
+from src.utils.summary_jobs import (
+    FAILED,
+    PENDING,
+    READY,
+    RUNNING,
+    SKIPPED,
+    SummaryJobQueue,
+)
+from src.utils.event_bus import (
+    CALL_ENDED,
+    SUMMARY_FAILED,
+    SUMMARY_READY,
+    TRANSCRIPT,
+    SessionEventBus,
+)
 
 load_dotenv()
 
@@ -42,8 +85,62 @@ auth_token = os.environ["TWILIO_AUTH_TOKEN"]
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise ValueError("Missing the OpenAI API key. Please set it in the .env file.")
+# Optional shared secret of trusted frontends; also signs per-session read tokens.
+# Unset, the session lookup and summary endpoints stay open as before.
+API_ACCESS_KEY = os.getenv("API_ACCESS_KEY")
 PORT = int(os.getenv("PORT", 5050))
 PERSONAL_PHONE_NUMBER = os.getenv("PERSONAL_PHONE_NUMBER")
+SEMANTIC_CACHE_BACKEND = os.getenv("SEMANTIC_CACHE_BACKEND", "memory")  # memory | redis
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", 3600))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 512))
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "qdrant")  # qdrant | local
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")  # float32 | float16 | int8
+LOCAL_INDEX_MAX_AGE = int(os.getenv("LOCAL_INDEX_MAX_AGE", 0))  # seconds, 0 = no limit
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "on") == "on"  # fuse BM25 with vectors
+RRF_K = int(os.getenv("RRF_K", 60))
+# Over-fetch, drop near-duplicates (MMR) and pack the rest into a token budget
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", 20))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 5))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", 0.7))
+MMR_DEDUPE_THRESHOLD = float(os.getenv("MMR_DEDUPE_THRESHOLD", 0.95))
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", 6))
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", 1200))
+HISTORY_ROLLUP_BATCH = int(os.getenv("HISTORY_ROLLUP_BATCH", 2))
+# complete: wait for the full gpt-4o-mini answer
+# stream: hand the first sentence to the Realtime model as soon as it is generated
+# direct: skip gpt-4o-mini and hand the retrieved chunks to the Realtime model
+RAG_RESPONSE_MODE = os.getenv("RAG_RESPONSE_MODE", "complete")
+RAG_STREAM_MIN_CHARS = int(os.getenv("RAG_STREAM_MIN_CHARS", 40))
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory")  # memory | redis
+SESSION_TTL = int(os.getenv("SESSION_TTL", 86400))
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", 2))
+# A pending/running summary not updated for this long is retried by any worker
+SUMMARY_STALE_SECONDS = int(os.getenv("SUMMARY_STALE_SECONDS", 300))
+# Per-call outbound audio queue bounds, in queued media messages
+TWILIO_QUEUE_FRAMES = int(os.getenv("TWILIO_QUEUE_FRAMES", 500))
+OPENAI_QUEUE_FRAMES = int(os.getenv("OPENAI_QUEUE_FRAMES", 100))
+AUDIO_COALESCE_FRAMES = int(os.getenv("AUDIO_COALESCE_FRAMES", 10))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 50))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 120))
+REALTIME_POOL_SIZE = int(os.getenv("REALTIME_POOL_SIZE", 2))  # 0 = connect per call
+REALTIME_POOL_MAX_AGE = float(os.getenv("REALTIME_POOL_MAX_AGE", 240))
+GREETING_CACHE_BACKEND = os.getenv("GREETING_CACHE_BACKEND", "disk")  # disk | redis | off
+GREETING_CACHE_MAX_ENTRIES = int(os.getenv("GREETING_CACHE_MAX_ENTRIES", 32))
+# memory | sqlite | redis; one SQLite file shared by several workers locks up, so
+# the default is redis when WEB_CONCURRENCY runs more than one
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY") or 1)
+EMBEDDING_CACHE_BACKEND = os.getenv("EMBEDDING_CACHE_BACKEND") or (
+    "redis" if WEB_CONCURRENCY > 1 else "sqlite"
+)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_SQLITE_PATH)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 4096))
+EVENT_BUS_BACKEND = os.getenv("EVENT_BUS_BACKEND", "memory")  # memory | redis
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", 15))
+PDF_CACHE_BACKEND = os.getenv("PDF_CACHE_BACKEND", "disk")  # disk | redis
+PDF_CACHE_MAX_ENTRIES = int(os.getenv("PDF_CACHE_MAX_ENTRIES", 256))
 
 ##############################################################
 ##############################################################
@@ -51,11 +148,16 @@ PERSONAL_PHONE_NUMBER = os.getenv("PERSONAL_PHONE_NUMBER")
 ##############################################################
 ##############################################################
 
-client_openai = OpenAI()
-
-vectordb_client = QdrantClient(
-    url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY")
+# One pooled client per upstream; tenant API keys are applied per request
+clients = ClientRegistry.from_env(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
 )
+client_openai = clients.openai()
+client_openai_async = clients.openai_async()
+vectordb_client = clients.qdrant()
+vectordb_client_async = clients.qdrant_async()
 
 redis_client = redis.Redis(
     host=redis_url.hostname,
@@ -67,6 +169,69 @@ redis_client = redis.Redis(
 
 twilio_client = Client(account_sid, auth_token)
 
+answer_cache = SemanticCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl_seconds=SEMANTIC_CACHE_TTL,
+    redis_client=redis_client if SEMANTIC_CACHE_BACKEND == "redis" else None,
+)
+
+# Conversation history, caller numbers, rolling and final summaries per session
+if SESSION_STORE_BACKEND == "redis":
+    session_store = RedisSessionStore(redis_client, ttl_seconds=SESSION_TTL)
+else:
+    session_store = InMemorySessionStore(ttl_seconds=SESSION_TTL)
+
+# Transcript turns and summary-ready events pushed to frontend subscribers
+event_bus = SessionEventBus(
+    redis_client=redis_client if EVENT_BUS_BACKEND == "redis" else None
+)
+
+# End-of-call summaries run off the request path, once per session
+summary_jobs = SummaryJobQueue(
+    lambda session_id: generate_conversation_summary(session_id),
+    session_store,
+    workers=SUMMARY_WORKERS,
+    stale_after_seconds=SUMMARY_STALE_SECONDS,
+    on_done=lambda session_id, outcome: send_to_frontend(
+        session_id, SUMMARY_READY if outcome == READY else SUMMARY_FAILED, status=outcome
+    ),
+)
+
+# Rendered greeting audio per (introduction, voice, model)
+greeting_cache = (
+    GreetingCache(
+        redis_client=redis_client if GREETING_CACHE_BACKEND == "redis" else None,
+        max_entries=GREETING_CACHE_MAX_ENTRIES,
+    )
+    if GREETING_CACHE_BACKEND != "off"
+    else None
+)
+
+# Query embeddings per (model, normalised text), shared with ingestion via SQLite
+embedding_cache = EmbeddingCache(
+    max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+    sqlite_path=EMBEDDING_CACHE_PATH if EMBEDDING_CACHE_BACKEND == "sqlite" else None,
+    redis_client=redis_client if EMBEDDING_CACHE_BACKEND == "redis" else None,
+)
+
+# Summary PDFs rendered once per summary content, served with an ETag
+pdf_cache = PDFCache(
+    redis_client=redis_client if PDF_CACHE_BACKEND == "redis" else None,
+    max_entries=PDF_CACHE_MAX_ENTRIES,
+)
+
+# Realtime sessions connected and configured ahead of the calls that use them
+realtime_pool = RealtimeSessionPool(
+    lambda: connect_realtime(),
+    lambda openai_ws, phone_number, introduction: configure_realtime_session(
+        openai_ws, phone_number, introduction
+    ),
+    (PERSONAL_PHONE_NUMBER, DEFAULT_INTRO),
+    size=REALTIME_POOL_SIZE,
+    max_age_seconds=REALTIME_POOL_MAX_AGE,
+)
+
 app = FastAPI()
 
 ##############################################################
@@ -75,13 +240,20 @@ app = FastAPI()
 ##############################################################
 ##############################################################
 
-CURR_SESSION_ID = '6c88023c-230c-4be6-ba34-26f83db6cb64'  # Track current session for frontend to join
-active_connections = []
+COLLECTION_NAME = "respiratory_disease_guide"
+REALTIME_MODEL = "gpt-4o-realtime-preview-2024-10-01"
+REALTIME_URL = f"wss://api.openai.com/v1/realtime?model={REALTIME_MODEL}"
+local_index = None  # in-process copy of COLLECTION_NAME when RETRIEVER_BACKEND=local
+lexical_index = None  # BM25 over the same chunks when HYBRID_RETRIEVAL is on
+
+rollups_in_flight = set()  # sessions with a rolling summary update running
+pdf_renders = {}  # summary digest -> render task, shared by concurrent requests
+
+rag_latency_stats = {}  # per RAG_RESPONSE_MODE: turns, time to function output, total
 
-conversation_histories = {}  # for session history
+audio_queues = {}  # session_id -> {"twilio": AudioQueue, "openai": AudioQueue}
 
-conversation_summaries = {}  # for summaries
-session_caller_numbers = {}
+latency = LatencyRecorder()  # per-stage timing spans, served at /metrics
 
 # LOGGER
 VOICE = "alloy"
@@ -101,9 +273,79 @@ logger = logging.getLogger(__name__)
 # MOUNT TYPING SOUND
 current_dir = os.path.dirname(__file__)
 mp3_file_path = os.path.join(current_dir, "static", "typing.wav")
+typing_cue = AudioCue.from_wav(mp3_file_path, "typing")  # pre-framed 8 kHz μ-law
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
+@app.on_event("startup")
+async def warm_up_clients():
+    # Pay the TLS handshakes here rather than during the first live call
+    await clients.warm_up(COLLECTION_NAME)
+
+
+@app.on_event("shutdown")
+async def close_clients():
+    await clients.aclose()
+
+
+@app.on_event("startup")
+async def start_realtime_pool():
+    await realtime_pool.start()
+
+
+@app.on_event("shutdown")
+async def stop_realtime_pool():
+    await realtime_pool.stop()
+
+
+@app.on_event("startup")
+async def start_event_bus():
+    await event_bus.start()
+
+
+@app.on_event("shutdown")
+async def stop_event_bus():
+    await event_bus.stop()
+
+
+@app.on_event("startup")
+async def start_summary_workers():
+    await summary_jobs.start()
+
+
+@app.on_event("shutdown")
+async def stop_summary_workers():
+    await summary_jobs.stop()
+
+
+@app.on_event("startup")
+async def load_local_index():
+    global local_index
+    if RETRIEVER_BACKEND != "local":
+        return
+    local_index = await asyncio.to_thread(
+        load_or_build,
+        vectordb_client,
+        COLLECTION_NAME,
+        dtype=LOCAL_INDEX_DTYPE,
+        max_age_seconds=LOCAL_INDEX_MAX_AGE,
+    )
+    if local_index is None:
+        logger.warning("Local vector index unavailable, falling back to Qdrant")
+
+
+@app.on_event("startup")
+async def load_lexical_index():
+    global lexical_index
+    if not HYBRID_RETRIEVAL:
+        return
+    lexical_index = await asyncio.to_thread(
+        load_or_build_lexical, vectordb_client, COLLECTION_NAME
+    )
+    if lexical_index is None:
+        logger.warning("Lexical index unavailable, using vector search only")
+
+
 # Takes in the call from Twilio and Streams it into OPENAI RealTime API
 @app.api_route("/incoming-call", methods=["GET", "POST"])
 async def handle_incoming_call(
@@ -119,14 +361,17 @@ async def handle_incoming_call(
         await request.form() if request.method == "POST" else request.query_params
     )
     caller_number = form_data.get("From", "Unknown")
+    call_id = form_data.get("CallSid")
     logger.info(f"Caller: {caller_number}")
     # session_id = create_session(api_key, project_id, caller_number)
-    session_id = create_session(api_key, caller_number)
-    session_caller_numbers[session_id] = caller_number  # check
+    session_id = await asyncio.to_thread(create_session, api_key, caller_number, call_id)
     # logger.info(f"Project::{project_id}")
     logger.info(f"Incoming call handled. Session ID: {session_id}")
+    # Claim a Realtime session now so it is ready when Twilio opens the stream
+    realtime_pool.reserve(
+        session_id, *realtime_config(PERSONAL_PHONE_NUMBER, introduction)
+    )
     host = request.url.hostname
-    call_id = form_data.get("CallSid")
     response = VoiceResponse()
     response.pause(length=1)
     connect = Connect()
@@ -165,7 +410,7 @@ async def handle_end_call(
     session_id: Optional[str] = None,
     phone_number: Optional[str] = None,
 ):
-    state = redis_client.get(session_id)
+    state = await asyncio.to_thread(redis_client.get, session_id)
     if state:
         state = state.decode("utf-8")
     logger.info(f"Ending Stream with state: {state}")
@@ -192,249 +437,415 @@ async def handle_media_stream(
     # Create task termination event
     termination_event = asyncio.Event()
 
-    async with websockets.connect(
-        "wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-10-01",
-        extra_headers={
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "OpenAI-Beta": "realtime=v1",
-        },
-    ) as openai_ws:
-        try:
-            handle_first_response = time.time()
+    stream_accepted = time.perf_counter()
+    start_time = time.time()
+    stream_sid = None
+
+    # Each leg gets its own writer so a slow socket only backs up its own queue.
+    # Twilio's is up before the Realtime claim so a cached greeting can play during it.
+    twilio_queue = AudioQueue(
+        "twilio",
+        websocket.send_text,
+        lambda payload: twilio_media_frame(stream_sid, payload),
+        max_frames=TWILIO_QUEUE_FRAMES,
+        coalesce_max=AUDIO_COALESCE_FRAMES,
+        observe_send=lambda seconds: latency.observe("twilio_send", seconds, log=False),
+    ).start()
+
+    greeting_text = realtime_config(phone_number, introduction)[1]
+    cached_greeting = await lookup_greeting(greeting_text)
+    greeting_cue = cached_greeting[0] if cached_greeting is not None else None
+
+    async def await_stream_start():
+        """Read Twilio's messages up to "start"; a cached greeting starts playing right then."""
+        nonlocal stream_sid, start_time, api_key
+        while True:
+            data = loads(await websocket.receive_text())
+            if data["event"] != "start":
+                continue
+            api_key = data["start"]["customParameters"]["api_key"]
+            stream_sid = data["start"]["streamSid"]
             start_time = time.time()
-            stream_sid = None
-            await send_session_update(openai_ws, phone_number, introduction)
+            logger.info(f"Incoming stream has started {stream_sid}")
+            if greeting_cue is not None:
+                for chunk in greeting_cue.payloads(AUDIO_COALESCE_FRAMES):
+                    twilio_queue.put_audio(chunk)
+                latency.observe(
+                    "time_to_first_greeting", time.perf_counter() - stream_accepted
+                )
+            return
+
+    # Runs alongside the claim below, which may have to connect a fresh Realtime session
+    stream_start = asyncio.create_task(await_stream_start())
+    try:
+        async with realtime_pool.session(
+            session_id, *realtime_config(phone_number, introduction)
+        ) as openai_ws:
+            latency.observe("realtime_claim", time.perf_counter() - stream_accepted)
+            try:
+                handle_first_response = time.time()
+                rag_tasks = set()  # get_additional_context answers in flight
+
+                openai_queue = AudioQueue(
+                    "openai",
+                    openai_ws.send,
+                    openai_audio_append,
+                    max_frames=OPENAI_QUEUE_FRAMES,
+                    coalesce_max=AUDIO_COALESCE_FRAMES,
+                    observe_send=lambda seconds: latency.observe(
+                        "openai_send", seconds, log=False
+                    ),
+                ).start()
+                audio_queues[session_id] = {"twilio": twilio_queue, "openai": openai_queue}
+
+                # A cached greeting is already playing (or starts with the stream);
+                # otherwise the model renders it and the audio is captured for next time
+                greeting = {"capture": None}
+                if cached_greeting is not None:
+                    greeting_transcript = cached_greeting[1]
+                    await send_greeting_context(openai_ws, greeting_transcript)
+                    await record_turn(session_id, "assistant", greeting_transcript)
+                else:
+                    await send_greeting(openai_ws, greeting_text)
+                    if greeting_cache is not None:
+                        greeting["capture"] = []
+
+                async def check_timeout():
+                    logger.info(f"Checking inactivity. Session ID: {session_id}")
+                    try:
+                        while not termination_event.is_set():
+                            current_time = time.time()
+                            diff = current_time - start_time
+                            if diff > 300:
+                                logger.info(
+                                    f"Session timeout after 30 seconds of inactivity. Session ID: {session_id}"
+                                )
+                                termination_event.set()
+                                await clear_buffer(twilio_queue, openai_ws, stream_sid)
+                                await websocket.close()
+                                break
+                            await asyncio.sleep(5)
+                    except Exception as e:
+                        raise e
 
-            async def check_timeout():
-                logger.info(f"Checking inactivity. Session ID: {session_id}")
-                try:
+                asyncio.create_task(check_timeout())
+
+                async def receive_from_twilio():
                     while not termination_event.is_set():
-                        current_time = time.time()
-                        diff = current_time - start_time
-                        if diff > 300:
+                        try:
+                            message = await websocket.receive_text()
+                            # Media frames are forwarded without a JSON round trip
+                            payload = extract_media_payload(message)
+                            if payload is not None:
+                                if openai_ws.open:
+                                    openai_queue.put_audio(payload)
+                                continue
+                            data = loads(message)
+                            # "start" was consumed by await_stream_start
+                            if data["event"] == "dtmf":
+                                digit = data["dtmf"]["digit"]
+                                logger.info(f"DTMF received: {digit}")
+                                if digit == "0":
+                                    await asyncio.to_thread(redis_client.set, session_id, "transfer")
+                                    logger.info("DTMF '0' detected, redirecting call...")
+                                    termination_event.set()
+                                    await websocket.close()
+                                    break
+                            elif data["event"] == "media":
+                                # Frames the fast path did not recognise (e.g. reordered keys)
+                                if openai_ws.open:
+                                    openai_queue.put_audio(data["media"]["payload"])
+                        except WebSocketDisconnect:
                             logger.info(
-                                f"Session timeout after 30 seconds of inactivity. Session ID: {session_id}"
+                                f"Twilio WebSocket disconnected. Session ID: {session_id}"
                             )
-                            termination_event.set()
-                            await clear_buffer(websocket, openai_ws, stream_sid)
-                            await websocket.close()
+                            summary_jobs.enqueue(session_id)
+                            break
+                        except RuntimeError as e:
+                            if "WebSocket is not connected" in str(e):
+                                logger.info(
+                                    f"WebSocket connection lost. Session ID: {session_id}"
+                                )
+                                break
+                            logger.error(f"Runtime error in receive_from_twilio: {e}")
+                            break
+                        except Exception as e:
+                            logger.error(f"Error in receive_from_twilio: {e}")
                             break
-                        await asyncio.sleep(5)
-                except Exception as e:
-                    raise e
 
-            asyncio.create_task(check_timeout())
+                # Rest of a streamed RAG answer, spoken after the partial answer's response.
+                # The remainder and that response's response.done can arrive in either order.
+                continuation = {"text": None, "response_id": None, "waiting": False, "done": False}
+
+                # perf_counter marks of the current turn, cleared by the first audio delta
+                turn_marks = {
+                    # A cached greeting's first audio was already timed at stream start
+                    "greeting": stream_accepted if greeting_cue is None else None,
+                    "speech_stopped": None,
+                    "function_output": None,
+                }
+
+                def mark_first_audio():
+                    now = time.perf_counter()
+                    if turn_marks["greeting"] is not None:
+                        latency.observe("time_to_first_greeting", now - turn_marks["greeting"])
+                        turn_marks["greeting"] = None
+                    if turn_marks["speech_stopped"] is not None:
+                        latency.observe(
+                            "speech_to_first_audio", now - turn_marks["speech_stopped"]
+                        )
+                        turn_marks["speech_stopped"] = None
+                    if turn_marks["function_output"] is not None:
+                        latency.observe(
+                            "function_output_to_first_audio",
+                            now - turn_marks["function_output"],
+                        )
+                        turn_marks["function_output"] = None
+
+                async def answer_with_context(call_id, query):
+                    """Run the RAG lookup for a function call and hand the answer to the model."""
+                    # Loop the typing cue until the answer is handed over
+                    typing_stop = asyncio.Event()
+                    typing_task = asyncio.create_task(play_typing(twilio_queue, typing_stop))
+
+                    async def stop_typing():
+                        typing_stop.set()
+                        await typing_task
+
+                    logger.info("Query to KB Started")
+                    rag_started = time.time()
+
+                    # Store the user's query
+                    await record_turn(session_id, "user", query)
+                    print("Adding user query into conversation history when calling RAG")
+
+                    partial_output = None
+
+                    async def send_partial_output(text):
+                        nonlocal partial_output
+                        if partial_output is not None:
+                            return
+                        partial_output = text
+                        continuation.update(text=None, response_id=None, waiting=True, done=False)
+                        await stop_typing()
+                        await send_function_output(
+                            twilio_queue, openai_ws, stream_sid, call_id, text
+                        )
+                        turn_marks["function_output"] = time.perf_counter()
+                        record_rag_latency("stream", time.time() - rag_started)
 
-            async def receive_from_twilio():
-                nonlocal stream_sid, start_time, api_key
-                while not termination_event.is_set():
                     try:
-                        message = await websocket.receive_text()
-                        data = json.loads(message)
-                        if data["event"] == "media" and openai_ws.open:
-                            audio_append = {
-                                "type": "input_audio_buffer.append",
-                                "audio": data["media"]["payload"],
-                            }
-                            await openai_ws.send(json.dumps(audio_append))
-                        elif data["event"] == "start":
-                            api_key = data["start"]["customParameters"]["api_key"]
-                            stream_sid = data["start"]["streamSid"]
-                            start_time = time.time()
-                            logger.info(f"Incoming stream has started {stream_sid}")
-                        elif data["event"] == "dtmf":
-                            digit = data["dtmf"]["digit"]
-                            logger.info(f"DTMF received: {digit}")
-                            if digit == "0":
-                                redis_client.set(session_id, "transfer")
-                                logger.info("DTMF '0' detected, redirecting call...")
-                                termination_event.set()
-                                await websocket.close()
-                                break
-                    except WebSocketDisconnect:
+                        try:
+                            result = await get_additional_context(
+                                query, api_key, session_id, on_partial=send_partial_output
+                            )
+                        finally:
+                            await stop_typing()
+                        logger.info(f"Clear Audio::Additional Context gained")
+                        elapsed_time = time.time() - rag_started
                         logger.info(
-                            f"Twilio WebSocket disconnected. Session ID: {session_id}"
-                        )
-                        await asyncio.sleep(2)
-                        await generate_conversation_summary(session_id)
-                        # await get_conversation_summary(session_id)
-                        summary = await get_conversation_summary(session_id)
-                        print(
-                            f"Conversation Summary for Session {session_id}: {summary}"
+                            f"get_additional_context execution time: {elapsed_time:.4f} seconds"
                         )
-                        print(
-                            f"Conversation History for Session {session_id}: {conversation_histories[session_id]}"
-                        )
-                        break
-                    except RuntimeError as e:
-                        if "WebSocket is not connected" in str(e):
-                            logger.info(
-                                f"WebSocket connection lost. Session ID: {session_id}"
+                        latency.observe("rag_total", elapsed_time, log=False)
+                        if partial_output is None:
+                            await send_function_output(
+                                twilio_queue, openai_ws, stream_sid, call_id, result
                             )
-                            break
-                        logger.error(f"Runtime error in receive_from_twilio: {e}")
-                        break
+                            turn_marks["function_output"] = time.perf_counter()
+                            record_rag_latency(RAG_RESPONSE_MODE, elapsed_time, elapsed_time)
+                        else:
+                            record_rag_latency("stream", None, elapsed_time)
+                            # Speak the rest once the partial answer finishes
+                            remainder = (
+                                result[len(partial_output) :].strip()
+                                if result.startswith(partial_output)
+                                else ""
+                            )
+                            if remainder and continuation["waiting"]:
+                                if continuation["done"]:
+                                    continuation["waiting"] = False
+                                    await send_continuation(openai_ws, remainder)
+                                else:
+                                    continuation["text"] = remainder
+                            else:
+                                continuation.update(text=None, waiting=False)
+                    except asyncio.CancelledError:
+                        raise
                     except Exception as e:
-                        logger.error(f"Error in receive_from_twilio: {e}")
-                        break
+                        logger.error(f"Error answering get_additional_context: {e}")
 
-            async def send_to_twilio():
-                nonlocal stream_sid, start_time
-                try:
-                    async for openai_message in openai_ws:
-                        try:
-                            response = json.loads(openai_message)
-                            start_time = time.time()
-                            if response["type"] in LOG_EVENT_TYPES:
-                                logger.info(
-                                    f"Received event: {response['type']}::{response}"
-                                )
-                            if response["type"] == "session.updated":
-                                logger.info(f"Session updated successfully: {response}")
-                            if response["type"] == "input_audio_buffer.speech_started":
-                                logger.info(f"Input Audio Detected::{response}")
-                                await clear_buffer(websocket, openai_ws, stream_sid)
-
-                            if response.get("type") == "response.done":
-                                output_items = response['response'].get('output', [])
+                async def send_to_twilio():
+                    nonlocal stream_sid, start_time
+                    try:
+                        async for openai_message in openai_ws:
+                            try:
+                                # Audio deltas are relayed as-is: no decode/re-encode
+                                delta = extract_audio_delta(openai_message)
+                                if delta is not None:
+                                    start_time = time.time()
+                                    if delta:
+                                        mark_first_audio()
+                                        twilio_queue.put_audio(delta)
+                                        if greeting["capture"] is not None:
+                                            greeting["capture"].append(delta)
+                                    continue
+
+                                response = loads(openai_message)
+                                start_time = time.time()
+                                if response["type"] in LOG_EVENT_TYPES:
+                                    logger.info(
+                                        f"Received event: {response['type']}::{response}"
+                                    )
+                                if response["type"] == "session.updated":
+                                    logger.info(f"Session updated successfully: {response}")
+                                if response["type"] == "input_audio_buffer.speech_stopped":
+                                    turn_marks["speech_stopped"] = time.perf_counter()
+                                if response["type"] == "input_audio_buffer.speech_started":
+                                    logger.info(f"Input Audio Detected::{response}")
+                                    continuation.update(text=None, waiting=False)  # caller barged in
+                                    greeting["capture"] = None  # greeting was cut off
+                                    await clear_buffer(twilio_queue, openai_ws, stream_sid)
+
+                                if (
+                                    response["type"] == "response.created"
+                                    and continuation["waiting"]
+                                    and continuation["response_id"] is None
+                                ):
+                                    continuation["response_id"] = response["response"]["id"]
+                                if (
+                                    response["type"] == "response.done"
+                                    and continuation["waiting"]
+                                    and response["response"].get("id")
+                                    == continuation["response_id"]
+                                ):
+                                    if continuation["text"]:
+                                        await send_continuation(openai_ws, continuation["text"])
+                                        continuation.update(text=None, waiting=False)
+                                    else:
+                                        # Partial answer spoken; the remainder is sent on arrival
+                                        continuation["done"] = True
+
+                                if (
+                                    response["type"] == "response.done"
+                                    and greeting["capture"] is not None
+                                ):
+                                    captured, greeting["capture"] = greeting["capture"], None
+                                    if response["response"].get("status") == "completed":
+                                        asyncio.create_task(
+                                            store_greeting(greeting_text, captured, response)
+                                        )
+
+                                if response.get("type") == "response.done":
+                                    output_items = response['response'].get('output', [])
                             
-                                if output_items:
-                                    for item in output_items:
-                                        content = item.get('content', [])
+                                    if output_items:
+                                        for item in output_items:
+                                            content = item.get('content', [])
                                         
-                                        if content:
-                                            for content_item in content:
-                                                assistant_text = content_item.get('transcript', None)
+                                            if content:
+                                                for content_item in content:
+                                                    assistant_text = content_item.get('transcript', None)
                             
-                                                # Check if 'role' exists (it's only in 'message' types)
-                                                role = item.get('role', None)
+                                                    # Check if 'role' exists (it's only in 'message' types)
+                                                    role = item.get('role', None)
                             
-                                                # Only process items with a role ('assistant' or 'user') or handle function calls
-                                                if role == 'assistant':
-                                                    if assistant_text:
-                                                        if session_id not in conversation_histories:
-                                                            conversation_histories[session_id] = []
-                                                        conversation_histories[session_id].append({"role": role if role else "unknown", "content": assistant_text})
-                                                        print("Adding response into conversation history from response.done")
-
-                            if response[
-                                "type"
-                            ] == "response.audio.delta" and response.get("delta"):
-                                try:
-                                    audio_payload = base64.b64encode(
-                                        base64.b64decode(response["delta"])
-                                    ).decode("utf-8")
-                                    audio_delta = {
-                                        "event": "media",
-                                        "streamSid": stream_sid,
-                                        "media": {"payload": audio_payload},
-                                    }
-                                    await websocket.send_json(audio_delta)
+                                                    # Only process items with a role ('assistant' or 'user') or handle function calls
+                                                    if role == 'assistant':
+                                                        if assistant_text:
+                                                            await record_turn(session_id, role, assistant_text)
+                                                            print("Adding response into conversation history from response.done")
+
+                                if response[
+                                    "type"
+                                ] == "response.audio.delta" and response.get("delta"):
+                                    # Only reached if the fast path could not slice the delta
+                                    mark_first_audio()
+                                    twilio_queue.put_audio(response["delta"])
+                                    if greeting["capture"] is not None:
+                                        greeting["capture"].append(response["delta"])
                                     start_time = time.time()
-                                except asyncio.TimeoutError:
-                                    logger.error(
-                                        "Timeout while sending audio data to Twilio"
-                                    )
-                                except Exception as e:
-                                    logger.error(f"Error processing audio data: {e}")
-                            if (
-                                response["type"]
-                                == "response.function_call_arguments.done"
-                            ):
-                                try:
-                                    function_name = response["name"]
-                                    call_id = response["call_id"]
-                                    arguments = json.loads(response["arguments"])
-                                    if function_name == "get_additional_context":
-                                        await play_typing(websocket, stream_sid)
-                                        logger.info("Query to KB Started")
-                                        start_time = time.time()
-                                        
-                                        # Store the user's query
-                                        if session_id not in conversation_histories:
-                                            conversation_histories[session_id] = []
-                                        conversation_histories[session_id].append(
-                                            {
-                                                "role": "user",
-                                                "content": arguments["query"],
-                                            }
-                                        )
-                                        print("Adding user query into conversation history when calling RAG")
-                                        
-                                        result = get_additional_context(
-                                            arguments["query"], api_key, session_id
-                                        )
-                                        logger.info(
-                                            f"Clear Audio::Additional Context gained"
-                                        )
-                                        await clear_buffer(
-                                            websocket, openai_ws, stream_sid
-                                        )
-                                        end_time = time.time()
-                                        elapsed_time = end_time - start_time
-                                        logger.info(
-                                            f"get_additional_context execution time: {elapsed_time:.4f} seconds"
-                                        )
-                                        function_response = {
-                                            "type": "conversation.item.create",
-                                            "item": {
-                                                "type": "function_call_output",
-                                                "call_id": call_id,
-                                                "output": result,
-                                            },
-                                        }
-                                        await openai_ws.send(
-                                            json.dumps(function_response)
+                                if (
+                                    response["type"]
+                                    == "response.function_call_arguments.done"
+                                ):
+                                    try:
+                                        function_name = response["name"]
+                                        call_id = response["call_id"]
+                                        arguments = json.loads(response["arguments"])
+                                        if function_name == "get_additional_context":
+                                            # Answered beside this loop, so the partial
+                                            # answer's audio is relayed while the rest
+                                            # of the completion is still streaming
+                                            start_time = time.time()
+                                            task = asyncio.create_task(
+                                                answer_with_context(call_id, arguments["query"])
+                                            )
+                                            rag_tasks.add(task)
+                                            task.add_done_callback(rag_tasks.discard)
+                                        elif function_name == "call_support":
+                                            logger.info(
+                                                "Detected Term for calling support..."
+                                            )
+                                            await asyncio.to_thread(redis_client.set, session_id, "transfer")
+                                            termination_event.set()
+                                            raise Exception("Close Stream")
+
+                                    except json.JSONDecodeError as e:
+                                        logger.error(
+                                            f"Error in json decode in function_call: {e}::{response}"
                                         )
-                                        await openai_ws.send(
-                                            json.dumps({"type": "response.create"})
-                                        )
-                                    elif function_name == "call_support":
-                                        logger.info(
-                                            "Detected Term for calling support..."
-                                        )
-                                        redis_client.set(session_id, "transfer")
-                                        termination_event.set()
+                                    except Exception as e:
+                                        logger.error(f"Error in function_call.done: {e}")
                                         raise Exception("Close Stream")
 
-                                except json.JSONDecodeError as e:
-                                    logger.error(
-                                        f"Error in json decode in function_call: {e}::{response}"
-                                    )
-                                except Exception as e:
-                                    logger.error(f"Error in function_call.done: {e}")
-                                    raise Exception("Close Stream")
-
-                        except json.JSONDecodeError as e:
-                            logger.error(
-                                f"Error in json decode of response: {e}::{openai_message}"
-                            )
+                            except json.JSONDecodeError as e:
+                                logger.error(
+                                    f"Error in json decode of response: {e}::{openai_message}"
+                                )
 
-                except WebSocketDisconnect:
-                    logger.info(
-                        f"OpenAI WebSocket disconnected. Session ID: {session_id}"
-                    )
-                    await generate_conversation_summary(session_id)  # check
-                except Exception as e:
-                    logger.error(f"Error in send_to_twilio: {e}")
-                    await generate_conversation_summary(session_id)  # check
-                    raise Exception("Close Stream")
-
-            await asyncio.gather(receive_from_twilio(), send_to_twilio())
-        except websockets.exceptions.ConnectionClosed:
-            logger.error(
-                f"WebSocket connection closed unexpectedly. Session ID: {session_id}"
-            )
-        except Exception as e:
-            logger.error(f"Unexpected error in handle_media_stream: {e}")
+                    except WebSocketDisconnect:
+                        logger.info(
+                            f"OpenAI WebSocket disconnected. Session ID: {session_id}"
+                        )
+                        summary_jobs.enqueue(session_id)
+                    except Exception as e:
+                        logger.error(f"Error in send_to_twilio: {e}")
+                        summary_jobs.enqueue(session_id)
+                        raise Exception("Close Stream")
+
+                # Twilio's messages are read in order: the start first, then the rest
+                await stream_start
+                await asyncio.gather(receive_from_twilio(), send_to_twilio())
+            except websockets.exceptions.ConnectionClosed:
+                logger.error(
+                    f"WebSocket connection closed unexpectedly. Session ID: {session_id}"
+                )
+            except Exception as e:
+                logger.error(f"Unexpected error in handle_media_stream: {e}")
+
+            finally:
+                # Covers hang-ups, DTMF transfers and timeouts; duplicates are dropped
+                summary_jobs.enqueue(session_id)
+                send_to_frontend(session_id, CALL_ENDED)
+                for task in rag_tasks:
+                    task.cancel()
+                try:
+                    await clear_buffer(twilio_queue, openai_ws, stream_sid)
+                    await twilio_queue.close()
+                    await openai_queue.close(drain=False)
+                    await openai_ws.close()
+                    await websocket.close()
+                except Exception:
+                    logger.info(f"WebSocket connection closed. Session ID: {session_id}")
+                finally:
+                    queues = audio_queues.pop(session_id, {})
+                    for name, queue in queues.items():
+                        logger.info(f"Audio queue {name} for {session_id}: {queue.metrics()}")
 
-        finally:
-            try:
-                await clear_buffer(websocket, openai_ws, stream_sid)
-                await openai_ws.close()
-                await websocket.close()
-            except Exception:
-                logger.info(f"WebSocket connection closed. Session ID: {session_id}")
+    finally:
+        # Also covers a failed claim, when the relay above never ran
+        stream_start.cancel()
+        await twilio_queue.close(drain=False)
 
 
 def start_recording(call_id: str, session_id: str, host: str):
@@ -455,11 +866,7 @@ def start_recording(call_id: str, session_id: str, host: str):
 
 
 ### VECTOR BASED RAG
-def get_additional_context(query, api_key, session_id):
-    # Initialize conversation history for new sessions
-    if session_id not in conversation_histories:
-        conversation_histories[session_id] = []
-
+async def get_additional_context(query, api_key, session_id, on_partial=None):
     custom_persona = """
     You are an AI assistant tasked with answering user queries based on a knowledge base. The user query is transcribed from voice audio, so there may be transcription errors.
 
@@ -470,8 +877,16 @@ def get_additional_context(query, api_key, session_id):
     Provide a concise answer, limited to three sentences.
     """
 
-    # Set API key
-    client_openai.api_key = api_key
+    # The caller's key is applied to this request only
+    openai_client = clients.openai_async(api_key)
+
+    # First sentence already handed to the caller; a retry continues after it
+    sent_partial = None
+
+    async def forward_partial(text):
+        nonlocal sent_partial
+        sent_partial = text
+        await on_partial(text)
 
     # Retry logic
     tries = 0
@@ -479,34 +894,117 @@ def get_additional_context(query, api_key, session_id):
     while tries <= max_retries:
         try:
             logger.info(f"OpenAI API query sent:: {query}")
-            # Retrieve contexts from the Qdrant vector database
-            retrieved_contexts = query_qdrant(query)
-            context_text = "\n".join(retrieved_contexts)
+            with latency.span("embedding"):
+                query_embedding = await get_embedding_async(query, api_key=api_key)
+
+            # Near-duplicate questions are answered straight from the cache
+            with latency.span("semantic_cache_lookup"):
+                cached_response = await lookup_cached_answer(query_embedding)
+            if cached_response is not None and sent_partial is None:
+                logger.info(f"Semantic cache hit for query:: {query}")
+                return cached_response
+
+            # Retrieve candidates, then keep the relevant, non-redundant ones
+            with latency.span("vector_search"):
+                candidates = await retrieve_candidates(
+                    query, query_embedding, RETRIEVAL_CANDIDATES
+                )
+            with latency.span("rerank", log=False):
+                selected = select_context(
+                    query_embedding,
+                    candidates,
+                    max_chunks=RETRIEVAL_TOP_K,
+                    max_tokens=CONTEXT_TOKEN_BUDGET,
+                    mmr_lambda=MMR_LAMBDA,
+                    dedupe_threshold=MMR_DEDUPE_THRESHOLD,
+                )
+            context_text = "\n".join(payload["text"] for payload in selected)
             logger.info(f"Qdrant context retrieved: {context_text}")
 
-            # Construct the conversation messages
+            if RAG_RESPONSE_MODE == "direct":
+                return (
+                    "Answer the user in at most three sentences using these knowledge base "
+                    f"excerpts: {context_text}"
+                )
+
+            # Construct the conversation messages from a bounded history window;
+            # older turns are represented by the rolling summary
+            history_length, recent_history, rollup = await asyncio.to_thread(
+                read_history_state, session_id
+            )
+            window_start, window = select_window(
+                recent_history,
+                max_turns=HISTORY_MAX_TURNS,
+                max_tokens=HISTORY_MAX_TOKENS,
+            )
+            window_start += history_length - len(recent_history)
             messages = [
                 {"role": "system", "content": custom_persona},
                 {"role": "system", "content": f"Retrieved Context: {context_text}"},
-                {"role": "user", "content": query},
             ]
-
-            # Add conversation history
-            messages.extend(conversation_histories[session_id])
-
-            # Add current query
-            messages.append({"role": "user", "content": query})
-
-            response = client_openai.chat.completions.create(
-                model="gpt-4o-mini", messages=messages
+            if rollup["summary"]:
+                messages.append(
+                    {
+                        "role": "system",
+                        "content": f"Summary of earlier conversation: {rollup['summary']}",
+                    }
+                )
+            messages.extend(window)
+
+            # The caller normally stores the query in history before calling us
+            if not window or window[-1]["content"] != query:
+                messages.append({"role": "user", "content": query})
+
+            # Only answers that saw nothing of this caller's conversation are shared
+            # through the cache; the greeting before their first question is generic
+            cacheable = not rollup["summary"] and not any(
+                message["role"] == "user" and message["content"] != query
+                for message in window
             )
 
-            logger.info(f"OpenAI response: {response}")
-            assistant_response = response.choices[0].message.content.strip()
+            if (
+                window_start - rollup["upto"] >= HISTORY_ROLLUP_BATCH
+                and session_id not in rollups_in_flight
+            ):
+                rollups_in_flight.add(session_id)
+                asyncio.create_task(update_rolling_summary(session_id, window_start))
+
+            if RAG_RESPONSE_MODE == "stream" and sent_partial is not None:
+                # A previous try failed mid-stream: generate only what follows
+                messages.append({"role": "assistant", "content": sent_partial})
+                messages.append(
+                    {
+                        "role": "system",
+                        "content": "Continue the answer from where it stopped, without repeating it.",
+                    }
+                )
+                with latency.span("chat_completion"):
+                    response = await openai_client.chat.completions.create(
+                        model="gpt-4o-mini", messages=messages
+                    )
+                rest = response.choices[0].message.content.strip()
+                assistant_response = f"{sent_partial} {rest}".strip()
+                logger.info(f"OpenAI continued response: {assistant_response}")
+            elif RAG_RESPONSE_MODE == "stream" and on_partial is not None:
+                with latency.span("chat_completion"):
+                    assistant_response = await stream_completion(
+                        messages, forward_partial, openai_client
+                    )
+                logger.info(f"OpenAI streamed response: {assistant_response}")
+            else:
+                with latency.span("chat_completion"):
+                    response = await openai_client.chat.completions.create(
+                        model="gpt-4o-mini", messages=messages
+                    )
+
+                logger.info(f"OpenAI response: {response}")
+                assistant_response = response.choices[0].message.content.strip()
+            if cacheable:
+                await store_cached_answer(query_embedding, assistant_response)
 
             # Upload KB fetching summaries to history
-            # conversation_histories[session_id].append(
-            #     {"role": "assistant", "content": assistant_response}
+            # session_store.append_message(
+            #     session_id, {"role": "assistant", "content": assistant_response}
             # )
             # print("Adding response into conversation history when calling RAG")
 
@@ -514,31 +1012,118 @@ def get_additional_context(query, api_key, session_id):
             
         except Exception as e:
             logger.error(f"Get Additional Context failed::Try {tries}::Error: {str(e)}")
-            time.sleep(2)  # Wait before retrying
+            await asyncio.sleep(2)  # Wait before retrying without blocking other calls
         tries += 1
 
-    return "Sorry, I didn't get your query."
+    # Whatever was already spoken stands; there is nothing to add
+    return sent_partial or "Sorry, I didn't get your query."
+
+
+async def lookup_cached_answer(query_embedding):
+    """Cached answer for a near-duplicate question, or None; cache errors count as a miss."""
+    try:
+        return await asyncio.to_thread(answer_cache.lookup, query_embedding)
+    except Exception as e:
+        logger.warning(f"Semantic cache lookup failed: {e}")
+        return None
+
+
+async def store_cached_answer(query_embedding, answer):
+    try:
+        await asyncio.to_thread(answer_cache.store, query_embedding, answer)
+    except Exception as e:
+        logger.warning(f"Semantic cache store failed: {e}")
+
+
+async def stream_completion(messages, on_partial, openai_client=None):
+    """Stream a gpt-4o-mini answer, passing the first full sentence to on_partial."""
+    openai_client = openai_client or client_openai_async
+    stream = await openai_client.chat.completions.create(
+        model="gpt-4o-mini", messages=messages, stream=True
+    )
+    parts = []
+    partial_sent = False
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        parts.append(chunk.choices[0].delta.content or "")
+        if not partial_sent:
+            text = "".join(parts)
+            cut = first_sentence_end(text, RAG_STREAM_MIN_CHARS)
+            if cut:
+                await on_partial(text[:cut].strip())
+                partial_sent = True
+    return "".join(parts).strip()
+
+
+def first_sentence_end(text, min_chars):
+    for index in range(min_chars, len(text)):
+        if text[index - 1] in ".!?" and text[index].isspace():
+            return index
+    return None
+
+
+def record_rag_latency(mode, time_to_output=None, total=None):
+    stats = rag_latency_stats.setdefault(
+        mode, {"turns": 0, "time_to_output_sum": 0.0, "total_sum": 0.0}
+    )
+    if time_to_output is not None:
+        stats["turns"] += 1
+        stats["time_to_output_sum"] += time_to_output
+        logger.info(f"RAG latency::mode={mode}::time_to_output={time_to_output:.4f}")
+    if total is not None:
+        stats["total_sum"] += total
+        logger.info(f"RAG latency::mode={mode}::total={total:.4f}")
+
+
+async def record_turn(session_id, role, content):
+    """Add a turn to the session history and push it to live transcript subscribers."""
+    await asyncio.to_thread(
+        session_store.append_message, session_id, {"role": role, "content": content}
+    )
+    send_to_frontend(session_id, TRANSCRIPT, role=role, content=content)
 
 
 # def create_session(api_key, project_id, caller_number):
-def create_session(api_key, caller_number):
+def create_session(api_key, caller_number, call_sid=None):
 
-    client_openai.api_key = api_key
+    # Twilio can retry the webhook for the same call; keep its session
+    if call_sid:
+        existing_session_id = session_store.get_session_by_call_sid(call_sid)
+        if existing_session_id:
+            return existing_session_id
 
     # Generate a unique session ID
-    session_id = CURR_SESSION_ID
+    session_id = str(uuid.uuid4())
     logger.info(f"Session Created for caller {caller_number}: {session_id}")
 
     # Initialize conversation history for this session
-    conversation_histories[session_id] = [
-        {"role": "system", "content": "You are a helpful assistant."}
-    ]
+    session_store.init_session(
+        session_id,
+        caller_number,
+        [{"role": "system", "content": "You are a helpful assistant."}],
+    )
+    session_store.register_call(session_id, call_sid, caller_number)
 
     return session_id
 
 
-async def send_session_update(openai_ws, phone_number, introduction):
-    introduction = introduction.replace("+", " ")
+async def connect_realtime():
+    return await websockets.connect(
+        REALTIME_URL,
+        extra_headers={
+            "Authorization": f"Bearer {OPENAI_API_KEY}",
+            "OpenAI-Beta": "realtime=v1",
+        },
+    )
+
+
+def realtime_config(phone_number, introduction):
+    # The introduction arrives form-encoded in the media stream URL
+    return phone_number, introduction.replace("+", " ")
+
+
+async def configure_realtime_session(openai_ws, phone_number, introduction):
     session_update = {
         "type": "session.update",
         "session": {
@@ -582,7 +1167,10 @@ async def send_session_update(openai_ws, phone_number, introduction):
     }
     logger.info("Sending session update: %s", json.dumps(session_update))
     await openai_ws.send(json.dumps(session_update))
-    time.sleep(1)
+
+
+async def send_greeting(openai_ws, introduction):
+    # Client events are applied in order, so this follows the session.update
     initial_response = {
         "type": "conversation.item.create",
         "item": {
@@ -602,26 +1190,99 @@ async def send_session_update(openai_ws, phone_number, introduction):
     )
 
 
-async def play_typing(websocket, stream_sid):
-    with open(mp3_file_path, "rb") as mp3_file:
-        mp3_data = mp3_file.read()
-        base64_audio = base64.b64encode(mp3_data).decode("utf-8")
+async def send_greeting_context(openai_ws, transcript):
+    # The caller hears the cached greeting; the model only needs to know it was said
+    greeting_item = {
+        "type": "conversation.item.create",
+        "item": {
+            "type": "message",
+            "role": "assistant",
+            "content": [{"type": "text", "text": transcript}],
+        },
+    }
+    await openai_ws.send(json.dumps(greeting_item))
 
-    audio_delta = {
-        "event": "media",
-        "streamSid": stream_sid,
-        "media": {"payload": base64_audio},
+
+async def lookup_greeting(introduction):
+    """(cue, transcript) of the cached greeting, or None; cache errors count as a miss."""
+    if greeting_cache is None:
+        return None
+    try:
+        return await asyncio.to_thread(greeting_cache.get, introduction, VOICE, REALTIME_MODEL)
+    except Exception as e:
+        logger.warning(f"Greeting cache lookup failed, rendering the greeting: {e}")
+        return None
+
+
+async def store_greeting(introduction, deltas, response):
+    transcript = " ".join(
+        content_item["transcript"]
+        for item in response["response"].get("output", [])
+        for content_item in item.get("content", [])
+        if content_item.get("transcript")
+    )
+    if not deltas or not transcript:
+        return
+    audio = b"".join(base64.b64decode(delta) for delta in deltas)
+    try:
+        await asyncio.to_thread(
+            greeting_cache.put, introduction, VOICE, REALTIME_MODEL, audio, transcript
+        )
+        logger.info(f"Cached greeting audio ({len(audio) / 8000:.1f} s) for: {introduction}")
+    except Exception as e:
+        logger.error(f"Error caching greeting audio: {e}")
+
+
+async def send_function_output(twilio_queue, openai_ws, stream_sid, call_id, output):
+    # Stop the typing cue, then hand the result to the Realtime model
+    await clear_buffer(twilio_queue, openai_ws, stream_sid)
+    function_response = {
+        "type": "conversation.item.create",
+        "item": {
+            "type": "function_call_output",
+            "call_id": call_id,
+            "output": output,
+        },
     }
-    await websocket.send_json(audio_delta)
+    with latency.span("function_output_send"):
+        await openai_ws.send(json.dumps(function_response))
+        await openai_ws.send(json.dumps({"type": "response.create"}))
 
 
-async def clear_buffer(websocket, openai_ws, stream_sid):
+async def send_continuation(openai_ws, text):
+    continuation_item = {
+        "type": "conversation.item.create",
+        "item": {
+            "type": "message",
+            "role": "system",
+            "content": [
+                {
+                    "type": "input_text",
+                    "text": f"Continue your previous answer with this additional knowledge base information, without repeating yourself: {text}",
+                }
+            ],
+        },
+    }
+    await openai_ws.send(json.dumps(continuation_item))
+    await openai_ws.send(json.dumps({"type": "response.create"}))
+
+
+async def play_typing(twilio_queue, stop_event):
+    try:
+        await stream_cue(twilio_queue.put_audio, typing_cue, stop_event)
+    except Exception as e:
+        logger.error(f"Error playing typing cue: {e}")
+
+
+async def clear_buffer(twilio_queue, openai_ws, stream_sid):
     audio_delta = {
         "streamSid": stream_sid,
         "event": "clear",
     }
     await openai_ws.send(json.dumps({"type": "response.cancel"}))
-    await websocket.send_json(audio_delta)
+    # Audio still queued for the caller is stale once they barge in
+    twilio_queue.flush()
+    twilio_queue.put_control(json.dumps(audio_delta))
 
 
 ##############################################################
@@ -632,20 +1293,70 @@ async def clear_buffer(websocket, openai_ws, stream_sid):
 
 
 def get_embedding(text, model="text-embedding-3-small"):
-    text = text.replace("\n", " ")
-    return client_openai.embeddings.create(input=[text], model=model).data[0].embedding
+    return embedding_cache.embed(client_openai, [text], model)[0]
 
 
 def query_qdrant(query_text):
     query_embedding = get_embedding(query_text)
     search_result = vectordb_client.search(
-        collection_name="respiratory_disease_guide",
+        collection_name=COLLECTION_NAME,
         query_vector=query_embedding,
         limit=5,
     )
     return [hit.payload["text"] for hit in search_result]
 
 
+async def get_embedding_async(text, model="text-embedding-3-small", api_key=None):
+    embeddings = await embedding_cache.embed_async(
+        clients.openai_async(api_key), [text], model
+    )
+    return embeddings[0]
+
+
+async def retrieve_candidates(query_text, query_embedding, limit):
+    """Ranked [{"payload", "score", "vector"}, ...]; vector is None for BM25-only hits."""
+    if local_index is not None:
+        vector_hits = local_index.search(query_embedding, limit, with_vectors=True)
+    else:
+        search_result = await vectordb_client_async.search(
+            collection_name=COLLECTION_NAME,
+            query_vector=query_embedding,
+            limit=limit,
+            with_vectors=True,
+        )
+        vector_hits = [(hit.score, hit.payload, hit.vector) for hit in search_result]
+    vectors = {
+        payload.get("content_hash") or payload["text"]: vector
+        for _, payload, vector in vector_hits
+    }
+
+    if lexical_index is None:
+        return [
+            {"payload": payload, "score": score, "vector": vector}
+            for score, payload, vector in vector_hits
+        ]
+
+    # Exact drug, place and clinic names survive noisy transcripts better in BM25
+    with latency.span("lexical_search", log=False):
+        lexical_payloads = [
+            payload for _, payload in lexical_index.search(query_text, limit)
+        ]
+    fused = reciprocal_rank_fusion(
+        [[payload for _, payload, _ in vector_hits], lexical_payloads],
+        limit=limit,
+        k=RRF_K,
+        with_scores=True,
+    )
+    return [
+        {
+            "payload": payload,
+            "score": score,
+            "vector": vectors.get(payload.get("content_hash") or payload["text"]),
+        }
+        for score, payload in fused
+    ]
+
+
 def rag_system(user_query):
     retrieved_contexts = query_qdrant(user_query)
     context_text = "\n".join(retrieved_contexts)
@@ -667,20 +1378,69 @@ def rag_system(user_query):
     return response.choices[0].message.content.strip()
 
 
+def get_rollup(session_id):
+    return {
+        "summary": session_store.get_meta(session_id, "rollup_summary", ""),
+        "upto": session_store.get_meta(session_id, "rollup_upto", 0),
+    }
+
+
+def read_history_state(session_id):
+    """History length, the recent turns and the rollup, read in one worker thread."""
+    history_length = session_store.history_length(session_id)
+    recent_history = session_store.get_history(session_id, -(HISTORY_MAX_TURNS + 1))
+    return history_length, recent_history, get_rollup(session_id)
+
+
+async def update_rolling_summary(session_id, upto):
+    """Fold history[rollup upto:upto] into the session's rolling summary."""
+    try:
+        rollup = await asyncio.to_thread(get_rollup, session_id)
+        new_messages = await asyncio.to_thread(
+            session_store.get_history, session_id, rollup["upto"], upto - 1
+        )
+        response = await client_openai_async.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a helpful assistant tasked with summarizing conversations.",
+                },
+                {
+                    "role": "user",
+                    "content": build_rollup_prompt(rollup["summary"], new_messages),
+                },
+            ],
+        )
+        await asyncio.to_thread(
+            session_store.set_meta,
+            session_id,
+            rollup_summary=response.choices[0].message.content.strip(),
+            rollup_upto=upto,
+        )
+    except Exception as e:
+        logger.error(f"Error updating rolling summary: {e}")
+    finally:
+        rollups_in_flight.discard(session_id)
+
+
 async def generate_conversation_summary(session_id):
     """Generate a summary of the conversation for a given session."""
-    if (
-        session_id not in conversation_histories
-        or not conversation_histories[session_id]
-    ):
+    history = await asyncio.to_thread(session_store.get_history, session_id)
+    if not history:
         return None
+    # Only the system prompt, and at most the greeting: the caller never spoke
+    turns = [msg for msg in history if msg["role"] in ("user", "assistant")]
+    if len(turns) < 2 and not any(msg["role"] == "user" for msg in turns):
+        logger.info(f"Nothing to summarise for session {session_id}")
+        return SKIPPED
 
     try:
         # Format the conversation for summarization
         formatted_convo = "\n".join(
             [
                 f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
-                for msg in conversation_histories[session_id]
+                for msg in history
                 if msg["role"] in ["user", "assistant"]
             ]
         )
@@ -696,7 +1456,7 @@ async def generate_conversation_summary(session_id):
                             {formatted_convo}
                         """
 
-        summary_response = client_openai.chat.completions.create(
+        summary_response = await client_openai_async.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -710,12 +1470,19 @@ async def generate_conversation_summary(session_id):
         summary = summary_response.choices[0].message.content.strip()
 
         # Store the summary (you can modify this to store in a database)
-        conversation_summaries[session_id] = {
-            "summary": summary,
-            "timestamp": datetime.now().isoformat(),
-            "caller_number": session_caller_numbers.get(session_id, "Unknown"),
-            "full_conversation": conversation_histories[session_id],
-        }
+        caller_number = await asyncio.to_thread(
+            session_store.get_meta, session_id, "caller_number", "Unknown"
+        )
+        await asyncio.to_thread(
+            session_store.set_summary,
+            session_id,
+            {
+                "summary": summary,
+                "timestamp": datetime.now().isoformat(),
+                "caller_number": caller_number,
+                "full_conversation": history,
+            },
+        )
 
         return summary
     except Exception as e:
@@ -723,11 +1490,86 @@ async def generate_conversation_summary(session_id):
         return None
 
 
+# Declared before the JSON route, whose {session_id} would also match "<id>.pdf"
+@app.get("/conversation-summary/{session_id}.pdf")
+async def get_conversation_summary_pdf(session_id: str, request: Request):
+    """The conversation summary as a PDF, rendered once and revalidated by ETag."""
+    if not has_session_token(request, session_id):
+        return unauthorized()
+    summary = await asyncio.to_thread(session_store.get_summary, session_id)
+    if summary is None:
+        summary_status = await asyncio.to_thread(summary_jobs.status, session_id)
+        if summary_status in (PENDING, RUNNING):
+            await summary_jobs.requeue_if_stale(session_id)
+            return JSONResponse(
+                content={"status": summary_status},
+                status_code=status.HTTP_202_ACCEPTED,
+            )
+        return JSONResponse(
+            content={"error": "Session not found"},
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
+
+    digest = summary_digest(summary)
+    headers = {
+        "ETag": f'"{digest}"',
+        "Cache-Control": "private, max-age=3600",
+    }
+    if etag_matches(request.headers.get("if-none-match"), digest):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    pdf_bytes = await render_summary_pdf(digest, summary)
+    headers["Content-Disposition"] = f'inline; filename="conversation-summary-{session_id}.pdf"'
+    return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
+
+
+async def render_summary_pdf(digest, summary):
+    pdf_bytes = await asyncio.to_thread(pdf_cache.get, digest)
+    if pdf_bytes is not None:
+        return pdf_bytes
+
+    task = pdf_renders.get(digest)
+    if task is None:
+
+        async def render():
+            try:
+                with latency.span("pdf_render"):
+                    rendered = await asyncio.to_thread(create_medical_pdf, summary, LOGO_PATH)
+                await asyncio.to_thread(pdf_cache.put, digest, rendered)
+                return rendered
+            finally:
+                pdf_renders.pop(digest, None)
+
+        task = pdf_renders[digest] = asyncio.create_task(render())
+    # A client hanging up must not cancel a render other requests wait on
+    return await asyncio.shield(task)
+
+
 @app.get("/conversation-summary/{session_id}")
-async def get_conversation_summary(session_id: str):
-    """API endpoint to retrieve conversation summary."""
-    if session_id in conversation_summaries:
-        return conversation_summaries[session_id]
+async def get_conversation_summary(session_id: str, request: Request):
+    """API endpoint to retrieve conversation summary and its generation status."""
+    if not has_session_token(request, session_id):
+        return unauthorized()
+    summary_status = await asyncio.to_thread(summary_jobs.status, session_id)
+    summary = await asyncio.to_thread(session_store.get_summary, session_id)
+    if summary is not None:
+        return {**summary, "status": READY}
+    if summary_status in (PENDING, RUNNING):
+        await summary_jobs.requeue_if_stale(session_id)
+        return JSONResponse(
+            content={"status": summary_status},
+            status_code=status.HTTP_202_ACCEPTED,
+        )
+    if summary_status == FAILED:
+        return JSONResponse(
+            content={"status": summary_status},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+    if summary_status == SKIPPED:
+        return JSONResponse(
+            content={"status": summary_status, "error": "Nothing was said on this call"},
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
     return {"error": "Session not found"}
 
 
@@ -739,40 +1581,233 @@ async def get_conversation_summary(session_id: str):
 
 
 @app.post("/api/get-session-id")
-async def generate_session():
-    try:
-        return JSONResponse(content={"sessionId": CURR_SESSION_ID})
-    except:
-        session_id = str(uuid.uuid4())
-        return JSONResponse(content={"sessionId": session_id})
+async def generate_session(
+    request: Request,
+    caller_number: Optional[str] = None,
+    call_sid: Optional[str] = None,
+    at: Optional[float] = None,
+):
+    """
+    Find the session of a call, by CallSid or by caller number at a point in time.
+    - With API_ACCESS_KEY set, only frontends sending it as X-API-Key may ask,
+      and the response carries a token for that session's summary and events.
+    """
+    if not has_api_key(request):
+        return unauthorized()
+    if call_sid:
+        session_id = await asyncio.to_thread(session_store.get_session_by_call_sid, call_sid)
+    elif caller_number:
+        sessions = await asyncio.to_thread(
+            session_store.find_sessions, caller_number, until=at, limit=1
+        )
+        session_id = sessions[0]["session_id"] if sessions else None
+    else:
+        return JSONResponse(
+            content={"error": "caller_number or call_sid is required"},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    if not session_id:
+        return JSONResponse(
+            content={"error": "Session not found"},
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
+    content = {"sessionId": session_id}
+    if API_ACCESS_KEY:
+        content["accessToken"] = sign_session_token(API_ACCESS_KEY, session_id, SESSION_TTL)
+    return JSONResponse(content=content)
+
+
+def has_api_key(request):
+    if not API_ACCESS_KEY:
+        return True
+    return secrets_match(API_ACCESS_KEY, request.headers.get("x-api-key"))
+
+
+def has_session_token(request, session_id):
+    if not API_ACCESS_KEY:
+        return True
+    return verify_session_token(API_ACCESS_KEY, session_id, request.query_params.get("token"))
+
+
+def unauthorized():
+    return JSONResponse(
+        content={"error": "Unauthorized"}, status_code=status.HTTP_401_UNAUTHORIZED
+    )
+
+
+@app.get("/api/sessions")
+async def list_sessions(
+    request: Request,
+    caller_number: str,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: int = 10,
+):
+    if not has_api_key(request):
+        return unauthorized()
+    sessions = await asyncio.to_thread(
+        session_store.find_sessions, caller_number, since=since, until=until, limit=limit
+    )
+    return JSONResponse(content={"sessions": sessions})
 
 
 @app.websocket("/stream/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
+    """Push session_id's events to a frontend as JSON messages until it disconnects."""
+    if not has_session_token(websocket, session_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
     await websocket.accept()
-    active_connections[session_id] = websocket
+    async with event_bus.subscribe(session_id) as events:
+        # Ends with WebSocketDisconnect when the frontend goes away
+        receiver = asyncio.create_task(drain_websocket(websocket))
+        try:
+            initial = await asyncio.to_thread(summary_event, session_id)
+            if initial is not None:
+                await websocket.send_json(initial)
+            while not receiver.done():
+                getter = asyncio.create_task(events.get())
+                done, _ = await asyncio.wait(
+                    {getter, receiver}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter in done:
+                    await websocket.send_json(getter.result())
+                else:
+                    getter.cancel()
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            receiver.cancel()
+
+
+@app.get("/events/{session_id}")
+async def stream_session_events(session_id: str, request: Request):
+    """Server-sent events for session_id: transcript, call_ended, summary_ready."""
+    if not has_session_token(request, session_id):
+        return unauthorized()
+
+    async def event_stream():
+        async with event_bus.subscribe(session_id) as events:
+            # Subscribed first, so a summary finishing now is not missed
+            initial = await asyncio.to_thread(summary_event, session_id)
+            if initial is not None:
+                yield format_sse(initial)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(
+                        events.get(), timeout=EVENT_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    # Keeps idle streams open behind the Heroku router
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def send_to_frontend(session_id: str, event_type: str, **data):
+    event_bus.publish(session_id, event_type, **data)
+
+
+def summary_event(session_id):
+    """The summary event a new subscriber should see at once, if it is already decided."""
+    summary_status = summary_jobs.status(session_id)
+    if summary_status == READY or session_store.get_summary(session_id) is not None:
+        return {"type": SUMMARY_READY, "session_id": session_id, "at": time.time()}
+    if summary_status in (FAILED, SKIPPED):
+        return {
+            "type": SUMMARY_FAILED,
+            "session_id": session_id,
+            "status": summary_status,
+            "at": time.time(),
+        }
+    return None
+
+
+def format_sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
 
-    try:
-        while True:
-            data = await websocket.receive_text()
-            # Handle any incoming messages from frontend
-    except Exception as e:
-        print(f"Error: {e}")
-    finally:
-        del active_connections[session_id]
 
+async def drain_websocket(websocket):
+    while True:
+        await websocket.receive_text()
 
-# In your existing handle_media_stream function, add:
-async def send_to_frontend(session_id: str, message: str):
-    if session_id in active_connections:
-        await active_connections[session_id].send_text(message)
 
+@app.get("/api/stats")
+async def get_stats(request: Request):
+    """
+    Every subsystem's counters in one response; /metrics has the aggregates.
+    Lists live session IDs, so it needs X-API-Key like the session lookup.
+    """
+    if not has_api_key(request):
+        return unauthorized()
+    # Its size is a Redis round trip with the redis backend
+    semantic_cache_stats = await asyncio.to_thread(answer_cache.stats)
+    return JSONResponse(
+        content={
+            "semantic_cache": semantic_cache_stats,
+            "embedding_cache": embedding_cache.stats(),
+            "pdf_cache": pdf_cache.stats(),
+            "greeting_cache": greeting_cache.stats()
+            if greeting_cache is not None
+            else {"backend": "off"},
+            "event_bus": event_bus.metrics(),
+            "realtime_pool": realtime_pool.metrics(),
+            "rag_latency": rag_latency_report(),
+            "audio_queues": {
+                session_id: {name: queue.metrics() for name, queue in queues.items()}
+                for session_id, queues in audio_queues.items()
+            },
+        }
+    )
 
-"""
-# Use it in your OpenAI handler:
-if stream_sid in active_connections:
-    await send_to_frontend(session_id, openai_response)
-"""
+
+def rag_latency_report():
+    report = {}
+    for mode, stats in rag_latency_stats.items():
+        turns = stats["turns"] or 1
+        report[mode] = {
+            "turns": stats["turns"],
+            "avg_time_to_function_output": stats["time_to_output_sum"] / turns,
+            "avg_total": stats["total_sum"] / turns,
+        }
+    return report
+
+
+@app.get("/metrics")
+async def get_metrics():
+    lines = [
+        "# HELP aide_active_calls Calls with an open media stream.",
+        "# TYPE aide_active_calls gauge",
+        f"aide_active_calls {len(audio_queues)}",
+        "# HELP aide_realtime_pool Realtime session pool state and claim counters.",
+        "# TYPE aide_realtime_pool gauge",
+        *(
+            f'aide_realtime_pool{{field="{field}"}} {value}'
+            for field, value in realtime_pool.metrics().items()
+        ),
+        "# HELP aide_embedding_cache Embedding cache lookups and hit rate.",
+        "# TYPE aide_embedding_cache gauge",
+        *(
+            f'aide_embedding_cache{{field="{field}"}} {value}'
+            for field, value in embedding_cache.stats().items()
+            if field != "backend"
+        ),
+        "# HELP aide_audio_queue_depth Audio messages waiting in outbound queues.",
+        "# TYPE aide_audio_queue_depth gauge",
+    ]
+    for leg in ("twilio", "openai"):
+        depth = sum(queues[leg].metrics()["depth"] for queues in audio_queues.values())
+        lines.append(f'aide_audio_queue_depth{{leg="{leg}"}} {depth}')
+    return PlainTextResponse(
+        latency.render_prometheus() + "\n".join(lines) + "\n",
+        media_type="text/plain; version=0.0.4",
+    )
 
 
 @app.get("/test")
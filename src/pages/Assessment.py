@@ -4,11 +4,12 @@ from datetime import datetime
 import requests
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
-from qdrant_client import QdrantClient
+from utils.clients import ClientRegistry
+from utils.embedding_cache import DEFAULT_SQLITE_PATH, EmbeddingCache
+from utils.event_bus import CALL_ENDED, SUMMARY_FAILED, SUMMARY_READY, TRANSCRIPT
 from datetime import datetime
+from itertools import chain
 from pathlib import Path
-import time
 
 load_dotenv()
 
@@ -16,19 +17,39 @@ OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
 QDRANT_URL = st.secrets["QDRANT_URL"]
 QDRANT_API_KEY = st.secrets["QDRANT_API_KEY"]
 PERSONAL_PHONE_NUMBER = st.secrets["PERSONAL_PHONE_NUMBER"]
+API_ACCESS_KEY = st.secrets.get("API_ACCESS_KEY")
 
 # Get the absolute path to the project root directory
 ROOT_DIR = Path(__file__).resolve().parents[2]
 LOGO_PATH = str(ROOT_DIR / "src" / "utils" / "lambdai.png")
 
-# Initialize OpenAI and Qdrant clients
-client = OpenAI()
-client.api_key = OPENAI_API_KEY
-vectordb_client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+# Retrieval results memoised per normalised question, shared across sessions
+RETRIEVAL_CACHE_ENTRIES = 256
+RETRIEVAL_CACHE_TTL = 3600
+
+
+@st.cache_resource
+def get_clients():
+    """
+    One pooled client registry and embedding cache per Streamlit server,
+    shared by every session and rerun instead of being rebuilt each time.
+    """
+    clients = ClientRegistry(
+        openai_api_key=OPENAI_API_KEY, qdrant_url=QDRANT_URL, qdrant_api_key=QDRANT_API_KEY
+    )
+    return clients, EmbeddingCache(sqlite_path=DEFAULT_SQLITE_PATH)
+
+
+clients, embedding_cache = get_clients()
+client = clients.openai()
+vectordb_client = clients.qdrant()
 
 # END POINTS
-CALL_STATUS_ENDPOINT = "https://aide-app-8fddbaafae53.herokuapp.com/api/get-session-id"  # Dummy endpoint for call status
-SUMMARY_ENDPOINT = "http://example.com/summary"  # Dummy endpoint for summary generation
+API_BASE_URL = "https://aide-app-8fddbaafae53.herokuapp.com"
+REQUEST_TIMEOUT = (5, 30)  # connect, read (seconds)
+# The event stream sends a keepalive every 15 s, so a read this long means it is gone
+EVENT_READ_TIMEOUT = 45
+SUMMARY_WAIT_SECONDS = 600
 
 
 def main():
@@ -78,15 +99,18 @@ def handle_user_input():
 
 def generate_assistant_response(user_input):
     with st.chat_message("assistant"):
-        response = rag_system(user_input)
+        # Tokens are rendered as they arrive, under the usual timestamp header
+        header = add_timestamp("")
+        streamed = st.write_stream(chain([header], stream_rag_response(user_input)))
+        response = streamed[len(header):].strip() if isinstance(streamed, str) else ""
         if response:
             st.session_state.messages.append({"role": "assistant", "content": response})
-            st.write(add_timestamp(response))
         else:
-            st.write(add_timestamp("Error: Unable to get a response."))
+            st.write("Error: Unable to get a response.")
 
 
-def rag_system(user_query):
+def stream_rag_response(user_query):
+    """Yield the answer's text deltas as the chat completion streams them."""
     retrieved_contexts = query_qdrant(user_query)
     context_text = "\n".join(retrieved_contexts)
 
@@ -99,13 +123,21 @@ def rag_system(user_query):
         {"role": "user", "content": user_query},
     ]
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini", messages=messages, temperature=0.7
+    stream = client.chat.completions.create(
+        model="gpt-4o-mini", messages=messages, temperature=0.7, stream=True
     )
-    return response.choices[0].message.content.strip()
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
 
 
 def query_qdrant(query_text):
+    # Whitespace-only differences share one cache entry
+    return retrieve_context(" ".join(query_text.split()))
+
+
+@st.cache_data(max_entries=RETRIEVAL_CACHE_ENTRIES, ttl=RETRIEVAL_CACHE_TTL, show_spinner=False)
+def retrieve_context(query_text):
     query_embedding = get_embedding(query_text)
     search_result = vectordb_client.search(
         collection_name="respiratory_disease_guide",
@@ -116,8 +148,7 @@ def query_qdrant(query_text):
 
 
 def get_embedding(text, model="text-embedding-3-small"):
-    text = text.replace("\n", " ")
-    return client.embeddings.create(input=[text], model=model).data[0].embedding
+    return embedding_cache.embed(client, [text], model)[0]
 
 
 # Define the help button
@@ -133,34 +164,41 @@ def call_assistance_dialog():
     # Display the predefined phone number
     st.success(f"Call the number from your phone: {PERSONAL_PHONE_NUMBER}")
 
+    # Used to find this caller's session among concurrent calls
+    caller_number = st.text_input(
+        "Your phone number (the one you are calling from)",
+        key="caller_number",
+    )
+
     if st.button(
         "Call ended? View & Download Call Summary Here!",
         icon="⬇️",
         use_container_width=True,
+        disabled=not caller_number,
     ):
-        summary_data = generate_summary()
+        summary_data = None
+        session_id, access_token = find_session(caller_number)
+        if session_id:
+            summary_data = fetch_summary(session_id, access_token)
+            if summary_data is None:
+                # Show the call as it happens; the summary is fetched the moment it is ready
+                st.caption("Live transcript")
+                outcome = {}
+                st.write_stream(follow_call(session_id, access_token, outcome))
+                if outcome.get("type") == SUMMARY_READY:
+                    summary_data = fetch_summary(session_id, access_token)
         if summary_data:
-            time.sleep(3)
             if "call_summary" not in st.session_state:
                 st.session_state["call_summary"] = ""
             st.session_state.call_summary = summary_data
+            st.session_state.call_session_id = session_id
+            st.session_state.call_access_token = access_token
             st.session_state.curr_page = "pdfviewer"
             st.rerun()
         else:
             st.error("Unable to Generate Call Summary.")
 
 
-# Function to simulate polling the call status endpoint
-def get_call_status():
-    try:
-        response = requests.get(CALL_STATUS_ENDPOINT)
-        if response.status_code == 200:
-            return response.json().get("status")  # Expecting { "status": "ended" }
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error checking call status: {str(e)}")
-    return "in_progress"
-
-
 def clear_conversation_history_button():
     if st.button("🗑️ Clear History", use_container_width=True):
         st.session_state.messages = []
@@ -172,34 +210,80 @@ def add_timestamp(message):
     return f"[{formatted_datetime}]\n\n{message}"
 
 
-def generate_summary():
+def find_session(caller_number):
+    """
+    (session ID, access token) of this caller's most recent call, or (None, None).
+    The token is None when the API runs without API_ACCESS_KEY.
+    """
     try:
-        # Step 1: Fetch the session ID
-        session_response = requests.post(
-            "https://aide-app-8fddbaafae53.herokuapp.com/api/get-session-id"
+        response = requests.post(
+            f"{API_BASE_URL}/api/get-session-id",
+            params={"caller_number": caller_number},
+            headers={"X-API-Key": API_ACCESS_KEY} if API_ACCESS_KEY else None,
+            timeout=REQUEST_TIMEOUT,
         )
-        if session_response.status_code == 200:
-            session_id = session_response.json().get("sessionId")
-
-            if not session_id:
-                st.error("Session ID could not be retrieved.")
-                return None
+        if response.status_code == 200:
+            session = response.json()
+            if session.get("sessionId"):
+                return session["sessionId"], session.get("accessToken")
+            st.error("Session ID could not be retrieved.")
+        elif response.status_code == 404:
+            st.error("No call found for this phone number.")
+        else:
+            st.error("Failed to generate session ID.")
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error looking up the call: {str(e)}")
+    return None, None
 
-            # Step 2: Use the session ID to fetch the conversation summary
-            summary_response = requests.get(
-                f"https://aide-app-8fddbaafae53.herokuapp.com/conversation-summary/{session_id}"
-            )
-            if summary_response.status_code == 200:
-                return summary_response.json()  # Return the JSON summary
 
+def fetch_summary(session_id, access_token):
+    """The conversation summary, or None while it is not ready yet."""
+    try:
+        response = requests.get(
+            f"{API_BASE_URL}/conversation-summary/{session_id}",
+            params={"token": access_token},
+            timeout=REQUEST_TIMEOUT,
+        )
+        if response.status_code == 200 and "error" not in response.json():
+            return response.json()
+        if response.status_code not in (200, 202):
             st.error("Failed to retrieve conversation summary.")
-        else:
-            st.error("Failed to generate session ID.")
     except requests.exceptions.RequestException as e:
         st.error(f"Error checking summary status: {str(e)}")
-
     return None
 
 
+def follow_call(session_id, access_token, outcome):
+    """
+    Yield the call's transcript turns from the server's event stream until the
+    summary is ready or has failed; the final event is stored in outcome.
+    """
+    deadline = datetime.now().timestamp() + SUMMARY_WAIT_SECONDS
+    try:
+        with requests.get(
+            f"{API_BASE_URL}/events/{session_id}",
+            params={"token": access_token},
+            stream=True,
+            timeout=(REQUEST_TIMEOUT[0], EVENT_READ_TIMEOUT),
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if datetime.now().timestamp() > deadline:
+                    return
+                if not line or not line.startswith("data:"):
+                    continue
+                event = json.loads(line[len("data:"):])
+                if event["type"] == TRANSCRIPT:
+                    speaker = "You" if event["role"] == "user" else "AIDoc"
+                    yield f"**{speaker}:** {event['content']}\n\n"
+                elif event["type"] == CALL_ENDED:
+                    yield "_Call ended, preparing your summary..._\n\n"
+                elif event["type"] in (SUMMARY_READY, SUMMARY_FAILED):
+                    outcome.update(event)
+                    return
+    except requests.exceptions.RequestException as e:
+        st.error(f"Lost connection to the call: {str(e)}")
+
+
 if __name__ == "__main__":
     main()
@@ -1,7 +1,9 @@
 import streamlit as st
 import base64
+import json
 from utils import generate_pdf_from_json
 from pathlib import Path
+from .Assessment import API_BASE_URL
 
 ROOT_DIR = Path(__file__).resolve().parents[2]
 LOGO_PATH = str(ROOT_DIR / "src" / "utils" / "lambdai.png")
@@ -56,13 +58,20 @@ def back_chat_button():
 
 
 def render_fullscreen_pdf() -> None:
-    summary_data = st.session_state.call_summary
-    pdf_bytes = generate_pdf_from_json(summary_data, LOGO_PATH)
-    b64_pdf = base64.b64encode(pdf_bytes).decode("utf-8")
+    session_id = st.session_state.get("call_session_id")
+    if session_id:
+        # The API renders and caches the PDF; the browser fetches it (and revalidates by ETag)
+        pdf_src = f"{API_BASE_URL}/conversation-summary/{session_id}.pdf"
+        access_token = st.session_state.get("call_access_token")
+        if access_token:
+            pdf_src = f"{pdf_src}?token={access_token}"
+    else:
+        summary_json = json.dumps(st.session_state.call_summary, sort_keys=True)
+        pdf_src = f"data:application/pdf;base64,{render_pdf_base64(summary_json)}"
 
     # Display PDF in Streamlit
     pdf_display = f"""
-        <iframe src="data:application/pdf;base64,{b64_pdf}" 
+        <iframe src="{pdf_src}" 
                 width="100%"
                 style="height: 100vh;"
                 type="application/pdf"
@@ -72,5 +81,12 @@ def render_fullscreen_pdf() -> None:
     st.markdown(pdf_display, unsafe_allow_html=True)
 
 
+@st.cache_data(max_entries=8, show_spinner=False)
+def render_pdf_base64(summary_json):
+    """Local fallback for summaries without a session ID, rendered once per summary."""
+    pdf_bytes = generate_pdf_from_json(json.loads(summary_json), LOGO_PATH)
+    return base64.b64encode(pdf_bytes).decode("utf-8")
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,40 @@
+import hmac
+import time
+import hashlib
+
+
+def secrets_match(expected, given):
+    """Constant-time comparison; False for missing or non-ASCII input instead of raising."""
+    if not expected or not given:
+        return False
+    try:
+        expected = str(expected).encode("ascii")
+        given = str(given).strip().encode("ascii")
+    except UnicodeEncodeError:
+        return False
+    return hmac.compare_digest(expected, given)
+
+
+def sign_session_token(secret, session_id, ttl_seconds=86400):
+    """
+    Token granting read access to one session's summary, PDF and events.
+    - Format is "<expiry>.<hex hmac-sha256 of session_id and expiry>", so it
+      can go in a URL (the PDF iframe, the event stream) without exposing
+      the shared secret.
+    """
+    expires_at = int(time.time() + ttl_seconds)
+    return f"{expires_at}.{_signature(secret, session_id, expires_at)}"
+
+
+def verify_session_token(secret, session_id, token):
+    if not token or "." not in token:
+        return False
+    expires_at, signature = token.split(".", 1)
+    if not expires_at.isascii() or not expires_at.isdigit() or int(expires_at) < time.time():
+        return False
+    return secrets_match(_signature(secret, session_id, int(expires_at)), signature)
+
+
+def _signature(secret, session_id, expires_at):
+    message = f"{session_id}\n{expires_at}".encode("utf-8")
+    return hmac.new(secret.encode("utf-8"), message, hashlib.sha256).hexdigest()
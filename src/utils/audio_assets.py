@@ -0,0 +1,145 @@
+import base64
+import struct
+import asyncio
+
+import numpy as np
+
+TWILIO_SAMPLE_RATE = 8000
+FRAME_MS = 20
+FRAME_BYTES = TWILIO_SAMPLE_RATE * FRAME_MS // 1000  # 1 byte per μ-law sample
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_MULAW = 7
+
+ULAW_BIAS = 0x84
+ULAW_CLIP = 32635
+
+
+class AudioCue:
+    """
+    A short clip pre-encoded for Twilio media streams.
+    - The audio is 8 kHz mono μ-law, split into 20 ms frames.
+    - Each frame's base64 payload is computed once, at load time.
+    """
+
+    def __init__(self, name, ulaw_bytes):
+        self.name = name
+        # Pad the tail with μ-law silence so every frame is exactly 20 ms
+        remainder = len(ulaw_bytes) % FRAME_BYTES
+        if remainder:
+            ulaw_bytes += b"\xff" * (FRAME_BYTES - remainder)
+        self.audio = ulaw_bytes
+        self.frames = self.payloads(1)
+
+    def payloads(self, frames_per_payload):
+        """Base64 payloads of frames_per_payload frames each, for bulk sends."""
+        size = FRAME_BYTES * frames_per_payload
+        return [
+            base64.b64encode(self.audio[i:i + size]).decode("utf-8")
+            for i in range(0, len(self.audio), size)
+        ]
+
+    @property
+    def duration(self):
+        return len(self.frames) * FRAME_MS / 1000
+
+    @classmethod
+    def from_wav(cls, path, name=None):
+        with open(path, "rb") as wav_file:
+            return cls(name or path, wav_to_ulaw(wav_file.read()))
+
+
+async def stream_cue(put_audio, cue, stop_event, loop=True, max_seconds=20.0):
+    """
+    Hand cue frames to put_audio at real-time pace until stop_event is set.
+    The clip restarts when it ends if loop is true, for at most max_seconds.
+    """
+    if not cue.frames:
+        return
+    clock = asyncio.get_running_loop()
+    started = clock.time()
+    sent = 0
+    while not stop_event.is_set():
+        if sent and sent % len(cue.frames) == 0 and not loop:
+            return
+        if sent * FRAME_MS / 1000 >= max_seconds:
+            return
+        put_audio(cue.frames[sent % len(cue.frames)])
+        sent += 1
+        # Sleep until this frame's slot ends, or return early if stopped
+        delay = started + sent * FRAME_MS / 1000 - clock.time()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+def wav_to_ulaw(data):
+    """Decode a PCM, float or μ-law WAV file into 8 kHz mono μ-law bytes."""
+    audio_format, channels, sample_rate, bits, samples = _parse_wav(data)
+
+    if (
+        audio_format == WAVE_FORMAT_MULAW
+        and channels == 1
+        and sample_rate == TWILIO_SAMPLE_RATE
+    ):
+        return samples
+
+    if audio_format == WAVE_FORMAT_MULAW:
+        pcm = ulaw_decode(np.frombuffer(samples, dtype=np.uint8)).astype(np.float32)
+    elif audio_format == WAVE_FORMAT_PCM and bits == 8:
+        pcm = (np.frombuffer(samples, dtype=np.uint8).astype(np.float32) - 128) * 256
+    elif audio_format == WAVE_FORMAT_PCM and bits == 16:
+        pcm = np.frombuffer(samples, dtype="<i2").astype(np.float32)
+    elif audio_format == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        pcm = np.frombuffer(samples, dtype="<f4") * 32767
+    else:
+        raise ValueError(f"Unsupported WAV encoding: format={audio_format} bits={bits}")
+
+    pcm = pcm[: len(pcm) - len(pcm) % channels].reshape(-1, channels).mean(axis=1)
+    if sample_rate != TWILIO_SAMPLE_RATE:
+        target_length = int(len(pcm) * TWILIO_SAMPLE_RATE / sample_rate)
+        positions = np.linspace(0, len(pcm) - 1, target_length)
+        pcm = np.interp(positions, np.arange(len(pcm)), pcm)
+    return ulaw_encode(np.clip(pcm, -32768, 32767).astype(np.int16)).tobytes()
+
+
+def ulaw_encode(pcm):
+    """G.711 μ-law encode int16 samples."""
+    pcm = pcm.astype(np.int32)
+    sign = (pcm < 0).astype(np.int32) << 7
+    magnitude = np.minimum(np.where(pcm < 0, -pcm - 1, pcm), ULAW_CLIP) + ULAW_BIAS
+    exponent = np.floor(np.log2(magnitude)).astype(np.int32) - 7
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+def ulaw_decode(ulaw):
+    """G.711 μ-law decode to int16 samples."""
+    ulaw = ~ulaw.astype(np.int32) & 0xFF
+    exponent = (ulaw >> 4) & 0x07
+    mantissa = ulaw & 0x0F
+    magnitude = (((mantissa << 3) + ULAW_BIAS) << exponent) - ULAW_BIAS
+    return np.where(ulaw & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+def _parse_wav(data):
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE file")
+    fmt = None
+    position = 12
+    while position + 8 <= len(data):
+        chunk_id = data[position:position + 4]
+        size = struct.unpack("<I", data[position + 4:position + 8])[0]
+        body = data[position + 8:position + 8 + size]
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack("<HHIIHH", body[:16])
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            audio_format, channels, sample_rate, _, _, bits = fmt
+            return audio_format, channels, sample_rate, bits, body
+        position += 8 + size + (size & 1)
+    raise ValueError("WAV file has no data chunk")
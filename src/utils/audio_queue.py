@@ -0,0 +1,165 @@
+import time
+import asyncio
+import binascii
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+AUDIO = "audio"
+CONTROL = "control"
+
+
+class AudioQueue:
+    """
+    Bounded outbound queue for one leg of a call, drained by its own writer task.
+    - put_audio() never blocks the reader feeding it: once max_frames audio
+      frames are waiting, the oldest one is dropped.
+    - Audio frames waiting together are coalesced into one message of at
+      most coalesce_max frames.
+    - Control messages keep their position, are never dropped or
+      coalesced, and are sent as-is.
+    - flush() discards queued audio, e.g. when the caller barges in.
+    - observe_send, if given, is called with the duration of every send.
+    """
+
+    def __init__(
+        self, name, send, frame, max_frames=500, coalesce_max=10, observe_send=None
+    ):
+        self.name = name
+        self.send = send  # async callable taking the serialised message
+        self.frame = frame  # base64 payload -> serialised message
+        self.observe_send = observe_send
+        self.max_frames = max_frames
+        self.coalesce_max = coalesce_max
+
+        self._items = deque()
+        self._audio_frames = 0
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._task = None
+
+        self.max_depth = 0
+        self.sent_messages = 0
+        self.sent_frames = 0
+        self.dropped_frames = 0
+        self.flushed_frames = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._writer())
+        return self
+
+    async def close(self, drain=True, timeout=1.0):
+        """Stop the writer, by default after sending what is already queued."""
+        self._closed = True
+        self._ready.set()
+        if self._task is None:
+            return
+        if not drain:
+            self._task.cancel()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self._task.cancel()
+        except Exception as e:
+            logger.error(f"{self.name} queue writer failed: {e}")
+
+    def put_audio(self, payload):
+        if self._closed:
+            return
+        if self._audio_frames >= self.max_frames:
+            self._drop_oldest_audio()
+        self._items.append((AUDIO, payload))
+        self._audio_frames += 1
+        self.max_depth = max(self.max_depth, self._audio_frames)
+        self._ready.set()
+
+    def put_control(self, message):
+        if self._closed:
+            return
+        self._items.append((CONTROL, message))
+        self._ready.set()
+
+    def flush(self):
+        """Drop every queued audio frame, keeping queued control messages."""
+        dropped = self._audio_frames
+        if dropped:
+            self._items = deque(item for item in self._items if item[0] == CONTROL)
+            self._audio_frames = 0
+            self.flushed_frames += dropped
+        return dropped
+
+    def metrics(self):
+        return {
+            "depth": self._audio_frames,
+            "max_depth": self.max_depth,
+            "sent_messages": self.sent_messages,
+            "sent_frames": self.sent_frames,
+            "dropped_frames": self.dropped_frames,
+            "flushed_frames": self.flushed_frames,
+        }
+
+    def _drop_oldest_audio(self):
+        for index, (kind, _) in enumerate(self._items):
+            if kind == AUDIO:
+                del self._items[index]
+                self._audio_frames -= 1
+                self.dropped_frames += 1
+                return
+
+    async def _writer(self):
+        try:
+            await self._drain()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The socket is gone; stop accepting frames for it
+            logger.error(f"{self.name} queue writer stopped: {e}")
+            self._closed = True
+            self._items.clear()
+            self._audio_frames = 0
+
+    async def _drain(self):
+        while True:
+            if not self._items:
+                if self._closed:
+                    return
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            kind, data = self._items.popleft()
+            if kind == CONTROL:
+                await self._send(data)
+                self.sent_messages += 1
+                continue
+
+            payloads = [data]
+            while (
+                self._items
+                and self._items[0][0] == AUDIO
+                and len(payloads) < self.coalesce_max
+            ):
+                payloads.append(self._items.popleft()[1])
+            self._audio_frames -= len(payloads)
+            await self._send(self.frame(merge_base64(payloads)))
+            self.sent_messages += 1
+            self.sent_frames += len(payloads)
+
+    async def _send(self, message):
+        if self.observe_send is None:
+            await self.send(message)
+            return
+        started = time.perf_counter()
+        await self.send(message)
+        self.observe_send(time.perf_counter() - started)
+
+
+def merge_base64(payloads):
+    """Join base64 payloads; decoding is only needed when one carries padding."""
+    if len(payloads) == 1:
+        return payloads[0]
+    if not any(payload.endswith("=") for payload in payloads[:-1]):
+        return "".join(payloads)
+    raw = b"".join(binascii.a2b_base64(payload) for payload in payloads)
+    return binascii.b2a_base64(raw, newline=False).decode("ascii")
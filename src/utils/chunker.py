@@ -0,0 +1,163 @@
+import re
+from functools import lru_cache
+
+import tiktoken
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model="text-embedding-3-small"):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model="text-embedding-3-small"):
+    return len(get_encoding(model).encode(text))
+
+
+def iter_chunks(pages, max_tokens=400, overlap_tokens=60, model="text-embedding-3-small"):
+    """
+    Stream token-bounded chunks out of markdown pages.
+    - pages is an iterable of (page_number, markdown) pairs.
+    - Chunks never cross a markdown heading; inside a section paragraphs are
+      packed up to max_tokens and consecutive chunks share overlap_tokens.
+    - Each chunk is a dict with text, page, offset (exact character offset
+      of its first character in the page), section (the heading trail) and
+      token_count.
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+
+    encoding = get_encoding(model)
+    headings = []
+
+    for page, markdown in pages:
+        for section_offset, section_text, heading in _split_sections(markdown):
+            if heading is not None:
+                level, title = heading
+                headings = headings[: level - 1] + [title]
+            section = " > ".join(headings)
+
+            pieces = _split_pieces(section_text, section_offset, encoding)
+            for text, offset, token_count in _pack(pieces, encoding, max_tokens, overlap_tokens):
+                yield {
+                    "text": text,
+                    "page": page,
+                    "offset": offset,
+                    "section": section,
+                    "token_count": token_count,
+                }
+
+
+def _split_sections(markdown):
+    """Yield (offset, text, heading) for each heading-delimited section."""
+    section_start = 0
+    heading = None
+    position = 0
+    for line in markdown.splitlines(keepends=True):
+        match = HEADING_RE.match(line)
+        if match and position > section_start:
+            yield section_start, markdown[section_start:position], heading
+        if match:
+            section_start = position
+            heading = (len(match.group(1)), match.group(2).strip("*_ "))
+        position += len(line)
+    if position > section_start:
+        yield section_start, markdown[section_start:position], heading
+
+
+def _split_pieces(text, base_offset, encoding):
+    """Yield (text, offset, tokens) for each paragraph of a section."""
+    start = 0
+    for match in list(PARAGRAPH_BREAK_RE.finditer(text)) + [None]:
+        end = match.start() if match else len(text)
+        paragraph = text[start:end]
+        stripped = paragraph.strip()
+        if stripped:
+            offset = base_offset + start + paragraph.index(stripped[0])
+            yield stripped, offset, encoding.encode(stripped)
+        if match:
+            start = match.end()
+
+
+def _pack(pieces, encoding, max_tokens, overlap_tokens):
+    """
+    Greedily pack paragraphs into chunks, seeding each chunk with the tail of
+    the previous one's last paragraph.
+    - An oversized paragraph is cut into token windows sharing overlap_tokens.
+      Short pieces waiting in the buffer (a heading, a lead-in sentence) open
+      its first window instead of becoming a content-free chunk of their own.
+    - Offsets are exact: every chunk starts at its first piece, and windows
+      and tails are cut at token boundaries mapped back onto the page text.
+    """
+    buffer = []  # [(text, offset, tokens)]
+
+    for text, offset, tokens in pieces:
+        if len(tokens) > max_tokens:
+            # Carry the buffer only while it leaves the first window room to advance
+            if buffer and _buffer_tokens(buffer) + 1 > (max_tokens - overlap_tokens) // 2:
+                yield _join(buffer)
+                buffer = []
+            yield from _windows(
+                buffer, text, offset, tokens, encoding, max_tokens, overlap_tokens
+            )
+            continue
+
+        # Joining pieces adds a paragraph break, which costs a token
+        if buffer and _buffer_tokens(buffer) + len(tokens) + 1 > max_tokens:
+            yield _join(buffer)
+            tail_budget = min(overlap_tokens, max_tokens - len(tokens) - 1)
+            buffer = _tail(buffer[-1], tail_budget, encoding)
+        buffer.append((text, offset, tokens))
+
+    if buffer:
+        yield _join(buffer)
+
+
+def _windows(buffer, text, offset, tokens, encoding, max_tokens, overlap_tokens):
+    """
+    Yield full chunks for an oversized paragraph appended to buffer; its last
+    window stays in buffer so the following paragraphs can join it.
+    """
+    _, starts = encoding.decode_with_offsets(tokens)
+    start = 0
+    while True:
+        room = max_tokens - _buffer_tokens(buffer) - (1 if buffer else 0)
+        end = min(start + room, len(tokens))
+        window_end = starts[end] if end < len(tokens) else len(text)
+        window_text = text[starts[start] : window_end]
+        lead = len(window_text) - len(window_text.lstrip())
+        buffer.append((window_text.strip(), offset + starts[start] + lead, tokens[start:end]))
+        if end == len(tokens):
+            return
+        yield _join(buffer)
+        buffer.clear()
+        start = end - overlap_tokens
+
+
+def _tail(piece, budget, encoding):
+    """The last budget tokens of a piece, as a one-piece buffer (empty if budget <= 0)."""
+    text, offset, tokens = piece
+    if budget <= 0:
+        return []
+    _, starts = encoding.decode_with_offsets(tokens)
+    tail_start = starts[-min(budget, len(tokens))]
+    tail_text = text[tail_start:]
+    stripped = tail_text.lstrip()
+    if not stripped:
+        return []
+    tail_offset = offset + tail_start + len(tail_text) - len(stripped)
+    return [(stripped, tail_offset, encoding.encode(stripped))]
+
+
+def _buffer_tokens(buffer):
+    return sum(len(tokens) for _, _, tokens in buffer) + max(len(buffer) - 1, 0)
+
+
+def _join(buffer):
+    """(text, offset, token_count) of the chunk made of buffer's pieces."""
+    return "\n\n".join(text for text, _, _ in buffer), buffer[0][1], _buffer_tokens(buffer)
@@ -0,0 +1,144 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+class ClientRegistry:
+    """
+    One pooled client per upstream, shared by everything in the process.
+    - Each upstream gets a single keep-alive connection pool, created lazily.
+    - A tenant's OpenAI key is applied per request: openai(api_key) returns a
+      copy bound to that key that reuses the shared pool, so no global
+      api_key is ever mutated.
+    - warm_up() opens the pools (TLS included) and warms the embedding model
+      before the first call needs them.
+    """
+
+    def __init__(
+        self,
+        openai_api_key=None,
+        qdrant_url=None,
+        qdrant_api_key=None,
+        max_connections=50,
+        max_keepalive_connections=20,
+        keepalive_expiry=120.0,
+        timeout=30.0,
+        max_tenants=32,
+    ):
+        self.openai_api_key = openai_api_key
+        self.qdrant_url = qdrant_url
+        self.qdrant_api_key = qdrant_api_key
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=5.0)
+        self.max_tenants = max_tenants
+
+        self._openai = None
+        self._openai_async = None
+        self._qdrant = None
+        self._qdrant_async = None
+        self._tenants = OrderedDict()  # (kind, api_key) -> client bound to that key
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        return cls(
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            qdrant_url=os.getenv("QDRANT_URL"),
+            qdrant_api_key=os.getenv("QDRANT_API_KEY"),
+            **kwargs,
+        )
+
+    # ------------------------------------------------------------------ #
+    # Clients
+    # ------------------------------------------------------------------ #
+    def openai(self, api_key=None):
+        if self._openai is None:
+            self._openai = OpenAI(
+                api_key=self.openai_api_key,
+                http_client=DefaultHttpxClient(limits=self.limits, timeout=self.timeout),
+            )
+        return self._for_tenant("sync", self._openai, api_key)
+
+    def openai_async(self, api_key=None):
+        if self._openai_async is None:
+            self._openai_async = AsyncOpenAI(
+                api_key=self.openai_api_key,
+                http_client=DefaultAsyncHttpxClient(
+                    limits=self.limits, timeout=self.timeout
+                ),
+            )
+        return self._for_tenant("async", self._openai_async, api_key)
+
+    def qdrant(self):
+        if self._qdrant is None:
+            self._qdrant = QdrantClient(
+                url=self.qdrant_url, api_key=self.qdrant_api_key, limits=self.limits
+            )
+        return self._qdrant
+
+    def qdrant_async(self):
+        if self._qdrant_async is None:
+            self._qdrant_async = AsyncQdrantClient(
+                url=self.qdrant_url, api_key=self.qdrant_api_key, limits=self.limits
+            )
+        return self._qdrant_async
+
+    def _for_tenant(self, kind, client, api_key):
+        if not api_key or api_key == client.api_key:
+            return client
+        key = (kind, api_key)
+        if key in self._tenants:
+            self._tenants.move_to_end(key)
+            return self._tenants[key]
+        # with_options copies the settings but keeps the same http_client
+        tenant_client = client.with_options(api_key=api_key)
+        self._tenants[key] = tenant_client
+        if len(self._tenants) > self.max_tenants:
+            self._tenants.popitem(last=False)
+        return tenant_client
+
+    # ------------------------------------------------------------------ #
+    # Lifecycle
+    # ------------------------------------------------------------------ #
+    async def warm_up(self, collection_name=None, embedding_model=EMBEDDING_MODEL):
+        """Open the OpenAI and Qdrant pools; failures are logged, not raised."""
+
+        async def warm_openai():
+            await self.openai_async().embeddings.create(
+                input=["warm-up"], model=embedding_model
+            )
+
+        async def warm_qdrant():
+            if collection_name:
+                await self.qdrant_async().get_collection(collection_name)
+            else:
+                await self.qdrant_async().get_collections()
+
+        results = await asyncio.gather(warm_openai(), warm_qdrant(), return_exceptions=True)
+        for name, result in zip(("openai", "qdrant"), results):
+            if isinstance(result, Exception):
+                logger.warning(f"Warm-up of {name} client failed: {result}")
+            else:
+                logger.info(f"Warm-up of {name} client done")
+
+    async def aclose(self):
+        if self._openai_async is not None:
+            await self._openai_async.close()
+        if self._qdrant_async is not None:
+            await self._qdrant_async.close()
+        if self._openai is not None:
+            self._openai.close()
+        if self._qdrant is not None:
+            self._qdrant.close()
@@ -0,0 +1,229 @@
+import os
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "embedding_cache.sqlite")
+)
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed on a hash of model + normalised text.
+    - An in-process LRU of max_entries vectors answers repeated texts.
+    - Passing sqlite_path or a redis client adds a persistent store behind
+      the LRU, so vectors survive restarts (and, with Redis, are shared by
+      every worker).
+    - embed()/embed_async() look up a batch, send only the misses to the
+      embeddings API in one request and store the results.
+    - A failing persistent store (e.g. SQLite "database is locked", a Redis
+      outage) is logged and treated as a miss, so the API answers instead.
+    """
+
+    def __init__(
+        self,
+        max_entries=4096,
+        sqlite_path=None,
+        redis_client=None,
+        ttl_seconds=30 * 86400,
+        namespace="embedding_cache",
+    ):
+        self.max_entries = max_entries
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0  # embeddings API calls made
+        self.requests_saved = 0  # batches answered without an API call
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> float32 vector
+        self._sqlite = None
+        if sqlite_path:
+            self._sqlite = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._sqlite.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._sqlite.commit()
+
+    # ------------------------------------------------------------------ #
+    # Public API
+    # ------------------------------------------------------------------ #
+    def embed(self, client, texts, model="text-embedding-3-small"):
+        """Return one embedding (list of floats) per text, calling the API for misses only."""
+        texts = [normalise_text(text) for text in texts]
+        keys = [embedding_key(model, text) for text in texts]
+        vectors = self._lookup(keys)
+        missing = _unique_missing(vectors, keys)
+        self._count_request(bool(missing))
+        if missing:
+            response = client.embeddings.create(
+                input=[texts[i] for i in missing], model=model
+            )
+            self._fill(vectors, keys, missing, response)
+        return [vector.tolist() for vector in vectors]
+
+    async def embed_async(self, client, texts, model="text-embedding-3-small"):
+        texts = [normalise_text(text) for text in texts]
+        keys = [embedding_key(model, text) for text in texts]
+        if self._has_store():
+            vectors = await asyncio.to_thread(self._lookup, keys)
+        else:
+            vectors = self._lookup(keys)
+        missing = _unique_missing(vectors, keys)
+        self._count_request(bool(missing))
+        if missing:
+            response = await client.embeddings.create(
+                input=[texts[i] for i in missing], model=model
+            )
+            if self._has_store():
+                await asyncio.to_thread(self._fill, vectors, keys, missing, response)
+            else:
+                self._fill(vectors, keys, missing, response)
+        return [vector.tolist() for vector in vectors]
+
+    def stats(self):
+        total = self.hits + self.misses
+        if self.redis_client is not None:
+            backend = "redis"
+        elif self._sqlite is not None:
+            backend = "sqlite"
+        else:
+            backend = "memory"
+        return {
+            "backend": backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "requests": self.requests,
+            "saved_requests": self.requests_saved,
+            "size": len(self._entries),
+        }
+
+    # ------------------------------------------------------------------ #
+    # Lookup / store
+    # ------------------------------------------------------------------ #
+    def _count_request(self, made):
+        with self._lock:
+            if made:
+                self.requests += 1
+            else:
+                self.requests_saved += 1
+
+    def _has_store(self):
+        return self.redis_client is not None or self._sqlite is not None
+
+    def _lookup(self, keys):
+        vectors = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    vectors[i] = vector
+
+        missing = _missing_indices(vectors)
+        if missing and self._has_store():
+            try:
+                stored = self._store_get([keys[i] for i in missing])
+            except Exception as e:
+                logger.warning(f"Embedding cache read failed, using the API: {e}")
+                stored = {}
+            for i in missing:
+                blob = stored.get(keys[i])
+                if blob is not None:
+                    vectors[i] = np.frombuffer(blob, dtype=np.float32)
+                    self._remember(keys[i], vectors[i])
+
+        found = len(keys) - len(_missing_indices(vectors))
+        with self._lock:
+            self.hits += found
+            self.misses += len(keys) - found
+        return vectors
+
+    def _fill(self, vectors, keys, missing, response):
+        fresh = {}
+        for item in response.data:
+            key = keys[missing[item.index]]
+            fresh[key] = np.asarray(item.embedding, dtype=np.float32)
+            self._remember(key, fresh[key])
+        # Repeats of a text inside the batch were sent once; copy the result
+        for i, key in enumerate(keys):
+            if vectors[i] is None:
+                vectors[i] = fresh[key]
+        if self._has_store():
+            try:
+                self._store_put({key: vector.tobytes() for key, vector in fresh.items()})
+            except Exception as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _store_get(self, keys):
+        if self.redis_client is not None:
+            blobs = self.redis_client.mget([f"{self.namespace}:{key}" for key in keys])
+            return {key: blob for key, blob in zip(keys, blobs) if blob is not None}
+        with self._lock:
+            placeholders = ",".join("?" * len(keys))
+            rows = self._sqlite.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys
+            ).fetchall()
+        return dict(rows)
+
+    def _store_put(self, entries):
+        if not entries:
+            return
+        if self.redis_client is not None:
+            pipe = self.redis_client.pipeline()
+            for key, blob in entries.items():
+                pipe.set(f"{self.namespace}:{key}", blob, ex=self.ttl_seconds)
+            pipe.execute()
+            return
+        now = time.time()
+        with self._lock:
+            self._sqlite.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                [(key, blob, now) for key, blob in entries.items()],
+            )
+            self._sqlite.commit()
+
+
+def normalise_text(text):
+    """Collapse whitespace (newlines included) after Unicode NFKC normalisation."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def embedding_key(model, text):
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _missing_indices(vectors):
+    return [i for i, vector in enumerate(vectors) if vector is None]
+
+
+def _unique_missing(vectors, keys):
+    """Indices of missing vectors, one per distinct key."""
+    seen = set()
+    missing = []
+    for i in _missing_indices(vectors):
+        if keys[i] not in seen:
+            seen.add(keys[i])
+            missing.append(i)
+    return missing
@@ -0,0 +1,136 @@
+import json
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT = "transcript"
+CALL_ENDED = "call_ended"
+SUMMARY_READY = "summary_ready"
+SUMMARY_FAILED = "summary_failed"
+
+
+class SessionEventBus:
+    """
+    Fan-out of per-session call events (transcript turns, call end, summary
+    ready) to frontend subscribers.
+    - Subscribers get a bounded asyncio.Queue of event dicts; a slow
+      subscriber loses its oldest events instead of holding up the call.
+    - With a redis client, publish() goes through Redis pub/sub and a
+      listener thread delivers every message to this worker's subscribers,
+      so a frontend connected to any worker sees events from all of them.
+      Without one, events are delivered in-process.
+    - Redis publishes go through a single writer thread, so a session's
+      events reach subscribers in the order they were published.
+    """
+
+    def __init__(self, redis_client=None, channel_prefix="aide:events", queue_size=256):
+        self.redis_client = redis_client
+        self.channel_prefix = channel_prefix
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+
+        self._subscribers = {}  # session_id -> set of asyncio.Queue
+        self._loop = None
+        self._thread = None
+        self._publisher = None
+        self._running = False
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._running = True
+        if self.redis_client is not None:
+            self._publisher = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="session-event-publisher"
+            )
+            self._thread = threading.Thread(
+                target=self._listen, name="session-event-bus", daemon=True
+            )
+            self._thread.start()
+
+    async def stop(self):
+        self._running = False
+        if self._publisher is not None:
+            # Flush events already handed to the writer before disconnecting
+            await asyncio.to_thread(self._publisher.shutdown, wait=True)
+            self._publisher = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, 5.0)
+            self._thread = None
+
+    # ------------------------------------------------------------------ #
+    # Publishing / subscribing
+    # ------------------------------------------------------------------ #
+    def publish(self, session_id, event_type, **data):
+        """Send an event to every subscriber of session_id; never blocks the caller."""
+        event = {"type": event_type, "session_id": session_id, "at": time.time(), **data}
+        self.published += 1
+        if self.redis_client is not None and self._running:
+            payload = json.dumps(event)
+            channel = f"{self.channel_prefix}:{session_id}"
+            future = self._loop.run_in_executor(
+                self._publisher, self.redis_client.publish, channel, payload
+            )
+            future.add_done_callback(self._log_publish_error)
+        else:
+            self._deliver(event)
+
+    @asynccontextmanager
+    async def subscribe(self, session_id):
+        """Yield a queue receiving session_id's events until the block exits."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(session_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(session_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[session_id]
+
+    def metrics(self):
+        return {
+            "backend": "redis" if self.redis_client is not None else "memory",
+            "sessions": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+    # ------------------------------------------------------------------ #
+    # Delivery
+    # ------------------------------------------------------------------ #
+    def _deliver(self, event):
+        for queue in self._subscribers.get(event["session_id"], ()):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    def _log_publish_error(self, future):
+        if future.exception() is not None:
+            logger.warning(f"Could not publish session event: {future.exception()}")
+
+    def _listen(self):
+        """Listener thread: Redis pub/sub messages onto the event loop."""
+        while self._running:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(f"{self.channel_prefix}:*")
+                while self._running:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    event = json.loads(message["data"])
+                    self._loop.call_soon_threadsafe(self._deliver, event)
+            except Exception as e:
+                logger.warning(f"Session event listener error, reconnecting: {e}")
+                time.sleep(1.0)
+            finally:
+                pubsub.close()
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from src.utils.audio_assets import AudioCue
+
+DEFAULT_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "greeting_cache"))
+
+
+class GreetingCache:
+    """
+    Rendered greeting audio per (introduction, voice, model).
+    - Entries are 8 kHz μ-law audio plus the transcript the model spoke, so a
+      hit can be streamed straight to Twilio as pre-framed AudioCue frames.
+    - Entries persist in cache_dir (one .ulaw and one .json file each) or, if
+      a redis client is passed, in Redis so every worker shares them.
+    - The least recently used entry is evicted once max_entries is reached;
+      a small in-process LRU sits in front of either backend.
+    """
+
+    def __init__(
+        self,
+        cache_dir=DEFAULT_CACHE_DIR,
+        redis_client=None,
+        max_entries=32,
+        ttl_seconds=7 * 86400,
+        namespace="greeting_cache",
+        memory_entries=8,
+    ):
+        self.cache_dir = cache_dir
+        self.redis_client = redis_client
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (AudioCue, transcript)
+
+    # ------------------------------------------------------------------ #
+    # Public API
+    # ------------------------------------------------------------------ #
+    def get(self, introduction, voice, model):
+        """Return (AudioCue, transcript) for the greeting, or None on a miss."""
+        key = greeting_key(introduction, voice, model)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+
+        if entry is None:
+            if self.redis_client is not None:
+                stored = self._redis_get(key)
+            else:
+                stored = self._disk_get(key)
+            if stored is not None:
+                audio, transcript = stored
+                entry = (AudioCue(f"greeting:{key[:8]}", audio), transcript)
+                self._remember(key, entry)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(self, introduction, voice, model, audio, transcript):
+        key = greeting_key(introduction, voice, model)
+        if self.redis_client is not None:
+            self._redis_put(key, audio, transcript)
+        else:
+            self._disk_put(key, audio, transcript)
+        self._remember(key, (AudioCue(f"greeting:{key[:8]}", audio), transcript))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": "redis" if self.redis_client is not None else "disk",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    # ------------------------------------------------------------------ #
+    # Disk backend
+    # ------------------------------------------------------------------ #
+    def _disk_get(self, key):
+        audio_path = os.path.join(self.cache_dir, f"{key}.ulaw")
+        try:
+            with open(audio_path, "rb") as audio_file:
+                audio = audio_file.read()
+            with open(os.path.join(self.cache_dir, f"{key}.json")) as meta_file:
+                transcript = json.load(meta_file)["transcript"]
+        except (OSError, ValueError, KeyError):
+            return None
+        os.utime(audio_path)  # mtime doubles as last-used time for eviction
+        return audio, transcript
+
+    def _disk_put(self, key, audio, transcript):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write the metadata first so a reader never finds audio without it
+        with open(os.path.join(self.cache_dir, f"{key}.json"), "w") as meta_file:
+            json.dump({"transcript": transcript, "created_at": time.time()}, meta_file)
+        temporary_path = os.path.join(self.cache_dir, f"{key}.ulaw.tmp")
+        with open(temporary_path, "wb") as audio_file:
+            audio_file.write(audio)
+        os.replace(temporary_path, os.path.join(self.cache_dir, f"{key}.ulaw"))
+        self._evict_disk()
+
+    def _evict_disk(self):
+        entries = sorted(
+            (
+                os.path.getmtime(os.path.join(self.cache_dir, name)),
+                name[: -len(".ulaw")],
+            )
+            for name in os.listdir(self.cache_dir)
+            if name.endswith(".ulaw")
+        )
+        for _, key in entries[: max(0, len(entries) - self.max_entries)]:
+            for suffix in (".ulaw", ".json"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, key + suffix))
+                except OSError:
+                    pass
+
+    # ------------------------------------------------------------------ #
+    # Redis backend
+    # ------------------------------------------------------------------ #
+    def _index_key(self):
+        return f"{self.namespace}:index"
+
+    def _entry_key(self, key):
+        return f"{self.namespace}:entry:{key}"
+
+    def _redis_get(self, key):
+        audio, transcript = self.redis_client.hmget(
+            self._entry_key(key), "audio", "transcript"
+        )
+        if audio is None:
+            self.redis_client.zrem(self._index_key(), key)
+            return None
+        self.redis_client.zadd(self._index_key(), {key: time.time()})
+        if isinstance(transcript, bytes):
+            transcript = transcript.decode("utf-8")
+        return audio, transcript or ""
+
+    def _redis_put(self, key, audio, transcript):
+        pipe = self.redis_client.pipeline()
+        pipe.hset(self._entry_key(key), mapping={"audio": audio, "transcript": transcript})
+        pipe.expire(self._entry_key(key), self.ttl_seconds)
+        pipe.zadd(self._index_key(), {key: time.time()})
+        pipe.execute()
+
+        overflow = self.redis_client.zcard(self._index_key()) - self.max_entries
+        if overflow > 0:
+            for stale in self.redis_client.zrange(self._index_key(), 0, overflow - 1):
+                stale = stale.decode("utf-8") if isinstance(stale, bytes) else stale
+                self.redis_client.delete(self._entry_key(stale))
+                self.redis_client.zrem(self._index_key(), stale)
+
+
+def greeting_key(introduction, voice, model):
+    return hashlib.sha1(f"{model}\n{voice}\n{introduction}".encode("utf-8")).hexdigest()
@@ -0,0 +1,50 @@
+from src.utils.chunker import count_tokens
+
+
+def select_window(history, max_turns=6, max_tokens=1200, model="gpt-4o-mini"):
+    """
+    Pick the most recent user/assistant messages that fit the budget.
+    - At most max_turns messages and max_tokens tokens are kept; the newest
+      message is always kept.
+    - Returns (start, window) where history[start:] holds every message
+      newer than the window cut, so history[:start] is what a rolling
+      summary has to cover.
+    """
+    window = []
+    used_tokens = 0
+    start = len(history)
+    for index in range(len(history) - 1, -1, -1):
+        message = history[index]
+        if message["role"] not in ("user", "assistant"):
+            continue
+        tokens = count_tokens(message["content"], model)
+        if window and (len(window) >= max_turns or used_tokens + tokens > max_tokens):
+            break
+        window.append({"role": message["role"], "content": message["content"]})
+        used_tokens += tokens
+        start = index
+    window.reverse()
+    return start, window
+
+
+def format_turns(messages):
+    return "\n".join(
+        f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
+        for msg in messages
+        if msg["role"] in ("user", "assistant")
+    )
+
+
+def build_rollup_prompt(previous_summary, messages):
+    """Prompt that folds messages into the existing rolling summary."""
+    return f"""
+        Update the running summary of this phone call with the new turns below.
+        Keep symptoms, medications, locations and any advice already given.
+        Reply with the updated summary only, in at most five sentences.
+
+        Running summary:
+        {previous_summary or "(none yet)"}
+
+        New turns:
+        {format_turns(messages)}
+    """
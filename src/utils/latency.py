@@ -0,0 +1,120 @@
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; the +Inf bucket is implicit
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class StageHistogram:
+    """
+    Latency distribution of one pipeline stage.
+    - Cumulative bucket counts, sum and count never reset, as Prometheus expects.
+    - Quantiles come from the most recent window_size observations, so they
+      follow the current load rather than the whole process lifetime.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window_size=2048):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.window = deque(maxlen=window_size)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.window.append(seconds)
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.bucket_counts[index] += 1
+                break
+
+    def quantiles(self, quantiles=QUANTILES):
+        if not self.window:
+            return {q: None for q in quantiles}
+        ordered = sorted(self.window)
+        last = len(ordered) - 1
+        return {q: ordered[min(last, int(round(q * last)))] for q in quantiles}
+
+    def cumulative_buckets(self):
+        running = 0
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            running += count
+            yield bound, running
+
+
+class LatencyRecorder:
+    """
+    Named timing spans across the call pipeline, rendered for Prometheus.
+    - observe() records a duration measured elsewhere; span() times a block.
+    - Spans are logged as "Latency span::stage=<stage>::seconds=<s>" unless
+      log=False, for high-rate stages such as websocket sends.
+    """
+
+    def __init__(self, prefix="aide", buckets=DEFAULT_BUCKETS, window_size=2048):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.window_size = window_size
+        self.stages = {}
+
+    def observe(self, stage, seconds, log=True):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = StageHistogram(
+                self.buckets, self.window_size
+            )
+        histogram.observe(seconds)
+        if log:
+            logger.info(f"Latency span::stage={stage}::seconds={seconds:.4f}")
+
+    @contextmanager
+    def span(self, stage, log=True):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, log=log)
+
+    def snapshot(self):
+        return {
+            stage: {
+                "count": histogram.count,
+                "mean": histogram.sum / histogram.count if histogram.count else None,
+                **{
+                    f"p{int(q * 100)}": value
+                    for q, value in histogram.quantiles().items()
+                },
+            }
+            for stage, histogram in sorted(self.stages.items())
+        }
+
+    def render_prometheus(self):
+        name = f"{self.prefix}_stage_latency_seconds"
+        quantile_name = f"{self.prefix}_stage_latency_quantile_seconds"
+        lines = [
+            f"# HELP {name} Duration of each call pipeline stage.",
+            f"# TYPE {name} histogram",
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            for bound, count in histogram.cumulative_buckets():
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+        lines += [
+            f"# HELP {quantile_name} Recent p50/p95/p99 of each call pipeline stage.",
+            f"# TYPE {quantile_name} gauge",
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            for q, value in histogram.quantiles().items():
+                if value is not None:
+                    lines.append(
+                        f'{quantile_name}{{stage="{stage}",quantile="{q}"}} {value:.6f}'
+                    )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,257 @@
+import os
+import re
+import json
+import math
+import time
+import logging
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+from src.utils.local_index import collection_fingerprint, fingerprint_ids, write_atomic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "lexical_index")
+)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    """
+    a about above after again against all am an and any are as at be because been
+    before being below between both but by can could did do does doing down during
+    each few for from further had has have having he her here hers herself him
+    himself his how i if in into is it its itself just me more most my myself no
+    nor not now of off on once only or other our ours ourselves out over own same
+    she should so some such than that the their theirs them themselves then there
+    these they this those through to too under until up very was we were what when
+    where which while who whom why will with would you your yours yourself
+    yourselves please use knowledge base user asked
+    """.split()
+)
+
+
+def tokenize(text):
+    """Lowercase, accent-folded word tokens without stopwords."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = text.encode("ascii", "ignore").decode("ascii")
+    return [token for token in TOKEN_RE.findall(text) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-process Okapi BM25 over the knowledge base chunks.
+    - Postings are stored CSR-style: per term, a slice of document ids and
+      their precomputed BM25 weights, so a query is one scatter-add per query
+      term plus a top-k partition.
+    - The snapshot lives in index_dir as postings.npz, vocab.json,
+      payloads.json and meta.json.
+    """
+
+    def __init__(self, vocab, offsets, doc_ids, weights, payloads, meta):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.payloads = payloads
+        self.meta = meta
+
+    def __len__(self):
+        return len(self.payloads)
+
+    # ------------------------------------------------------------------ #
+    # Query
+    # ------------------------------------------------------------------ #
+    def search(self, query_text, limit=5):
+        """Return [(score, payload), ...] for the limit best matching chunks."""
+        term_ids = {self.vocab[t] for t in tokenize(query_text) if t in self.vocab}
+        if not term_ids or not len(self):
+            return []
+
+        scores = np.zeros(len(self.payloads), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            # A document appears once per term, so plain fancy-index add is safe
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+
+        matched = np.count_nonzero(scores)
+        limit = min(limit, matched)
+        if not limit:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.payloads[i]) for i in top]
+
+    def is_stale(self, fingerprint=None, max_age_seconds=None, collection_name=None):
+        if fingerprint is not None and fingerprint != self.meta.get("fingerprint"):
+            return True
+        if collection_name is not None and collection_name != self.meta.get("collection"):
+            return True
+        if max_age_seconds and time.time() - self.meta["built_at"] > max_age_seconds:
+            return True
+        return False
+
+    # ------------------------------------------------------------------ #
+    # Build / persist
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def from_payloads(cls, collection_name, payloads, k1=1.2, b=0.75, point_ids=None):
+        payloads = list(payloads)
+        term_counts = [Counter(tokenize(payload["text"])) for payload in payloads]
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) and lengths.mean() else 1.0
+
+        postings = {}
+        for doc_id, counts in enumerate(term_counts):
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((doc_id, count))
+
+        vocab = {term: index for index, term in enumerate(sorted(postings))}
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        doc_ids, weights = [], []
+        total = len(payloads)
+        for term, term_id in vocab.items():
+            entries = postings[term]
+            idf = math.log(1 + (total - len(entries) + 0.5) / (len(entries) + 0.5))
+            for doc_id, count in entries:
+                norm = k1 * (1 - b + b * lengths[doc_id] / average_length)
+                doc_ids.append(doc_id)
+                weights.append(idf * count * (k1 + 1) / (count + norm))
+            offsets[term_id + 1] = len(doc_ids)
+
+        meta = {
+            "collection": collection_name,
+            "count": total,
+            "terms": len(vocab),
+            "k1": k1,
+            "b": b,
+            "fingerprint": fingerprint_ids(collection_name, point_ids)
+            if point_ids is not None
+            else None,
+            "built_at": time.time(),
+        }
+        return cls(
+            vocab,
+            offsets,
+            np.array(doc_ids, dtype=np.int32),
+            np.array(weights, dtype=np.float32),
+            payloads,
+            meta,
+        )
+
+    @classmethod
+    def from_qdrant(cls, vectordb_client, collection_name):
+        payloads, point_ids = [], []
+        offset = None
+        while True:
+            points, offset = vectordb_client.scroll(
+                collection_name=collection_name,
+                limit=1024,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            for point in points:
+                payloads.append(point.payload)
+                point_ids.append(point.id)
+            if offset is None:
+                break
+        return cls.from_payloads(collection_name, payloads, point_ids=point_ids)
+
+    def save(self, index_dir=DEFAULT_INDEX_DIR):
+        """Write the snapshot file by file through write_atomic, meta.json last."""
+        os.makedirs(index_dir, exist_ok=True)
+        write_atomic(
+            os.path.join(index_dir, "postings.npz"),
+            lambda f: np.savez(
+                f, offsets=self.offsets, doc_ids=self.doc_ids, weights=self.weights
+            ),
+        )
+        for name, value in (("vocab.json", self.vocab), ("payloads.json", self.payloads)):
+            write_atomic(
+                os.path.join(index_dir, name),
+                lambda f: f.write(json.dumps(value).encode("utf-8")),
+            )
+        write_atomic(
+            os.path.join(index_dir, "meta.json"),
+            lambda f: f.write(json.dumps(self.meta).encode("utf-8")),
+        )
+
+    @classmethod
+    def load(cls, index_dir=DEFAULT_INDEX_DIR):
+        """Load a snapshot, or return None when index_dir holds no index."""
+        meta_path = os.path.join(index_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(os.path.join(index_dir, "vocab.json")) as f:
+            vocab = json.load(f)
+        with open(os.path.join(index_dir, "payloads.json")) as f:
+            payloads = json.load(f)
+        with np.load(os.path.join(index_dir, "postings.npz")) as postings:
+            offsets = postings["offsets"]
+            doc_ids = postings["doc_ids"]
+            weights = postings["weights"]
+        if len(payloads) != meta["count"] or len(offsets) != len(vocab) + 1:
+            logger.warning(f"Lexical index in {index_dir} is mid-rebuild, ignoring it")
+            return None
+        return cls(vocab, offsets, doc_ids, weights, payloads, meta)
+
+
+def reciprocal_rank_fusion(rankings, limit=5, k=60, key=None, with_scores=False):
+    """
+    Merge ranked payload lists: score = sum of 1 / (k + rank) over the lists.
+    Payloads are matched on their content hash, or their text if they have none.
+    Returns payloads, or (score, payload) pairs with with_scores.
+    """
+    key = key or (lambda payload: payload.get("content_hash") or payload["text"])
+    scores = {}
+    payloads = {}
+    for ranking in rankings:
+        for rank, payload in enumerate(ranking, start=1):
+            payload_key = key(payload)
+            scores[payload_key] = scores.get(payload_key, 0.0) + 1.0 / (k + rank)
+            payloads.setdefault(payload_key, payload)
+    ordered = sorted(scores, key=scores.get, reverse=True)[:limit]
+    if with_scores:
+        return [(scores[payload_key], payloads[payload_key]) for payload_key in ordered]
+    return [payloads[payload_key] for payload_key in ordered]
+
+
+def load_or_build(
+    vectordb_client, collection_name, index_dir=DEFAULT_INDEX_DIR, max_age_seconds=None
+):
+    """
+    Return a ready BM25Index, or None so callers use vector search alone.
+    - A snapshot whose point-id fingerprint and collection match (and that is
+      younger than max_age_seconds) is used as is, as for the local vector index.
+    - A missing or stale snapshot is rebuilt from the Qdrant payloads and saved.
+    - When Qdrant is unreachable the existing snapshot is trusted.
+    """
+    index = BM25Index.load(index_dir)
+
+    try:
+        fingerprint = collection_fingerprint(vectordb_client, collection_name)
+    except Exception as e:
+        logger.warning(f"Could not reach Qdrant to validate lexical index: {e}")
+        if index is not None and index.is_stale(collection_name=collection_name):
+            return None
+        return index
+
+    if index is not None and not index.is_stale(
+        fingerprint, max_age_seconds, collection_name=collection_name
+    ):
+        logger.info(f"Loaded lexical index with {len(index)} chunks")
+        return index
+
+    try:
+        index = BM25Index.from_qdrant(vectordb_client, collection_name)
+        index.save(index_dir)
+        logger.info(f"Rebuilt lexical index with {len(index)} chunks")
+        return index
+    except Exception as e:
+        logger.error(f"Failed to rebuild lexical index: {e}")
+        return None
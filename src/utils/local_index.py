@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import argparse
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "vector_index")
+)
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+
+class LocalVectorIndex:
+    """
+    In-process copy of a Qdrant collection for top-k cosine search.
+    - Vectors are L2-normalised and held as float32, float16 or int8 (with a
+      per-row scale), so a query is a single matrix-vector product.
+    - The snapshot lives in index_dir as vectors.npy (memory-mapped on load),
+      payloads.json and meta.json. meta.json records a fingerprint of the
+      collection's point ids, so replaced chunks are noticed even when the
+      point count does not change.
+    """
+
+    def __init__(self, vectors, payloads, meta, scales=None):
+        self.vectors = vectors
+        self.payloads = payloads
+        self.meta = meta
+        self.scales = scales
+
+    def __len__(self):
+        return len(self.payloads)
+
+    # ------------------------------------------------------------------ #
+    # Query
+    # ------------------------------------------------------------------ #
+    def search(self, query_vector, limit=5, with_vectors=False):
+        """
+        Return [(score, payload), ...] for the limit closest points, or
+        [(score, payload, vector), ...] with their float32 vectors.
+        """
+        if not len(self):
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        if self.meta["dtype"] == "int8":
+            scores = (self.vectors @ query) * self.scales
+        else:
+            scores = self.vectors @ query.astype(self.vectors.dtype)
+        scores = scores.astype(np.float32, copy=False)
+
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        if with_vectors:
+            vectors = self.vectors[top].astype(np.float32)
+            if self.scales is not None:
+                vectors *= self.scales[top, None]
+            return [
+                (float(scores[i]), self.payloads[i], vector)
+                for i, vector in zip(top, vectors)
+            ]
+        return [(float(scores[i]), self.payloads[i]) for i in top]
+
+    def is_stale(self, fingerprint=None, max_age_seconds=None, dtype=None, collection_name=None):
+        if fingerprint is not None and fingerprint != self.meta.get("fingerprint"):
+            return True
+        if dtype is not None and dtype != self.meta.get("dtype"):
+            return True
+        if collection_name is not None and collection_name != self.meta.get("collection"):
+            return True
+        if max_age_seconds and time.time() - self.meta["built_at"] > max_age_seconds:
+            return True
+        return False
+
+    # ------------------------------------------------------------------ #
+    # Build / persist
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def from_points(cls, collection_name, vectors, payloads, dtype="float32", point_ids=None):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported index dtype: {dtype}")
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(payloads), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+
+        scales = None
+        if dtype == "int8":
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            matrix = np.round(matrix / scales[:, None]).astype(np.int8)
+            scales = scales.astype(np.float32)
+        else:
+            matrix = matrix.astype(dtype)
+
+        meta = {
+            "collection": collection_name,
+            "count": len(payloads),
+            "dim": int(matrix.shape[1]) if len(payloads) else 0,
+            "dtype": dtype,
+            "fingerprint": fingerprint_ids(collection_name, point_ids)
+            if point_ids is not None
+            else None,
+            "built_at": time.time(),
+        }
+        return cls(matrix, list(payloads), meta, scales)
+
+    @classmethod
+    def from_qdrant(cls, vectordb_client, collection_name, dtype="float32"):
+        vectors, payloads, point_ids = [], [], []
+        offset = None
+        while True:
+            points, offset = vectordb_client.scroll(
+                collection_name=collection_name,
+                limit=256,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            for point in points:
+                vectors.append(point.vector)
+                payloads.append(point.payload)
+                point_ids.append(point.id)
+            if offset is None:
+                break
+        return cls.from_points(
+            collection_name, vectors, payloads, dtype=dtype, point_ids=point_ids
+        )
+
+    def save(self, index_dir=DEFAULT_INDEX_DIR):
+        """
+        Write the snapshot file by file through write_atomic, meta.json last.
+        Workers that memory-mapped the previous vectors.npy keep reading the
+        old file, and load() rejects a snapshot caught between two files.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        write_atomic(
+            os.path.join(index_dir, "vectors.npy"), lambda f: np.save(f, self.vectors)
+        )
+        if self.scales is not None:
+            write_atomic(
+                os.path.join(index_dir, "scales.npy"), lambda f: np.save(f, self.scales)
+            )
+        write_atomic(
+            os.path.join(index_dir, "payloads.json"),
+            lambda f: f.write(json.dumps(self.payloads).encode("utf-8")),
+        )
+        write_atomic(
+            os.path.join(index_dir, "meta.json"),
+            lambda f: f.write(json.dumps(self.meta).encode("utf-8")),
+        )
+
+    @classmethod
+    def load(cls, index_dir=DEFAULT_INDEX_DIR, mmap=True):
+        """Load a snapshot, or return None when index_dir holds no index."""
+        meta_path = os.path.join(index_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(os.path.join(index_dir, "payloads.json")) as f:
+            payloads = json.load(f)
+        vectors = np.load(
+            os.path.join(index_dir, "vectors.npy"), mmap_mode="r" if mmap else None
+        )
+        scales = None
+        if meta["dtype"] == "int8":
+            scales = np.load(os.path.join(index_dir, "scales.npy"))
+        if not len(vectors) == len(payloads) == meta["count"]:
+            logger.warning(f"Local index in {index_dir} is mid-rebuild, ignoring it")
+            return None
+        return cls(vectors, payloads, meta, scales)
+
+
+def write_atomic(path, write):
+    """
+    Call write(file) on a temporary file next to path, then rename it over
+    path. The old file's inode lives on for anyone still reading or mapping it.
+    """
+    temporary_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(temporary_path, "wb") as f:
+            write(f)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def fingerprint_ids(collection_name, point_ids):
+    """Order-independent hash of a collection's point ids."""
+    digest = hashlib.sha256(collection_name.encode("utf-8"))
+    for point_id in sorted(str(point_id) for point_id in point_ids):
+        digest.update(b"\n" + point_id.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def collection_fingerprint(vectordb_client, collection_name):
+    """
+    fingerprint_ids over the live collection. Ingestion derives point ids from
+    the chunk content, so any replaced chunk changes the fingerprint.
+    """
+    point_ids = []
+    offset = None
+    while True:
+        points, offset = vectordb_client.scroll(
+            collection_name=collection_name,
+            limit=1024,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False,
+        )
+        point_ids.extend(point.id for point in points)
+        if offset is None:
+            break
+    return fingerprint_ids(collection_name, point_ids)
+
+
+def load_or_build(
+    vectordb_client,
+    collection_name,
+    index_dir=DEFAULT_INDEX_DIR,
+    dtype="float32",
+    max_age_seconds=None,
+):
+    """
+    Return a ready LocalVectorIndex, or None so callers fall back to Qdrant.
+    - A snapshot whose fingerprint, dtype and collection match (and that is
+      younger than max_age_seconds) is used as is.
+    - A missing or stale snapshot is rebuilt from Qdrant and saved.
+    - When Qdrant is unreachable the existing snapshot is trusted.
+    """
+    index = LocalVectorIndex.load(index_dir)
+
+    try:
+        fingerprint = collection_fingerprint(vectordb_client, collection_name)
+    except Exception as e:
+        logger.warning(f"Could not reach Qdrant to validate local index: {e}")
+        if index is not None and index.is_stale(dtype=dtype, collection_name=collection_name):
+            return None
+        return index
+
+    if index is not None and not index.is_stale(
+        fingerprint, max_age_seconds, dtype=dtype, collection_name=collection_name
+    ):
+        logger.info(f"Loaded local vector index with {len(index)} points")
+        return index
+
+    try:
+        index = LocalVectorIndex.from_qdrant(vectordb_client, collection_name, dtype)
+        index.save(index_dir)
+        logger.info(f"Rebuilt local vector index with {len(index)} points")
+        return index
+    except Exception as e:
+        logger.error(f"Failed to rebuild local vector index: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from qdrant_client import QdrantClient
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        description="Snapshot a Qdrant collection into a local vector index."
+    )
+    parser.add_argument("--collection", default="respiratory_disease_guide")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--dtype", default="float32", choices=SUPPORTED_DTYPES)
+    args = parser.parse_args()
+
+    client = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"))
+    snapshot = LocalVectorIndex.from_qdrant(client, args.collection, args.dtype)
+    snapshot.save(args.index_dir)
+    print(f"Saved {len(snapshot)} points to {args.index_dir}")
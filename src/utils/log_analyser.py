@@ -0,0 +1,427 @@
+"""
+Offline latency analysis of the Heroku log exports in logs/*.tsv.
+
+Each export is parsed once, line by line, into a small columnar event table
+(only the lines the analysis needs) cached as .npz under DEFAULT_CACHE_DIR.
+Reports then stream those tables file by file in time order, so memory is
+bounded by the number of calls open at once plus one float per turn.
+
+Lines without a session ID ("Received event: ...", RAG timings) are
+attributed to the most recently started open session on the same dyno.
+
+    python -m src.utils.log_analyser logs/ --slow 10
+"""
+import os
+import re
+import json
+import time
+import heapq
+import hashlib
+import argparse
+from calendar import timegm
+from datetime import datetime
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "log_cache"))
+PARSER_VERSION = 1
+
+# Event kinds stored in the "kind" column
+SESSION_START = 1
+SESSION_END = 2
+STREAM_START = 3
+SPEECH_STOPPED = 4
+SPEECH_STARTED = 5
+AUDIO_DONE = 6
+RAG_START = 7
+RAG_TIME = 8
+SPAN = 9
+APP_ERROR = 10
+DYNO_RESTART = 11
+MEMORY_QUOTA = 12
+ROUTER = 13
+
+SESSION_ID = r"([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})"
+SESSION_START_RE = re.compile(r"WebSocket connection accepted\. Session ID: " + SESSION_ID)
+SESSION_END_RE = re.compile(
+    r"(?:Twilio WebSocket disconnected|WebSocket connection closed|WebSocket connection lost"
+    r"|OpenAI WebSocket disconnected|Session timeout.*)\. Session ID: " + SESSION_ID
+)
+STREAM_START_RE = re.compile(r"Incoming stream has started (\S+)")
+RAG_TIME_RE = re.compile(r"get_additional_context execution time: ([0-9.]+) seconds")
+SPAN_RE = re.compile(r"Latency span::stage=([\w.-]+)::seconds=([0-9.]+)")
+ROUTER_RE = re.compile(r'path="([^"]*)".*?service=(\d+)ms status=(\d+)')
+UUID_RE = re.compile(r"/[0-9a-f]{8}-[0-9a-f-]{27}|/\+?\d{6,}")
+
+
+class EventTable:
+    """Columns of one log file: ts, dyno, kind, value, code, text (string ids)."""
+
+    COLUMNS = ("ts", "dyno", "kind", "value", "code", "text")
+
+    def __init__(self, columns, strings, lines):
+        self.columns = columns
+        self.strings = strings
+        self.lines = lines
+
+    def __len__(self):
+        return len(self.columns["ts"])
+
+    def save(self, path):
+        np.savez(
+            path,
+            strings=np.array(self.strings, dtype=str),
+            lines=np.array([self.lines]),
+            **self.columns,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            columns = {name: data[name] for name in cls.COLUMNS}
+            return cls(columns, data["strings"].tolist(), int(data["lines"][0]))
+
+
+def parse_log_file(path):
+    """Stream one TSV export into an EventTable, keeping only relevant lines."""
+    ts, dyno, kind, value, code, text = [], [], [], [], [], []
+    strings = []
+    string_ids = {}
+    time_cache = {}
+    lines = 0
+
+    def intern(string):
+        if string not in string_ids:
+            string_ids[string] = len(strings)
+            strings.append(string)
+        return string_ids[string]
+
+    with open(path, encoding="utf-8", errors="replace") as log_file:
+        for line in log_file:
+            lines += 1
+            fields = line.rstrip("\n").split("\t", 9)
+            if len(fields) < 10 or not fields[0].isdigit():
+                continue
+            source, message = fields[8], fields[9]
+            event = _classify(source, message)
+            if event is None:
+                continue
+
+            stamp = fields[1]
+            if stamp not in time_cache:
+                time_cache[stamp] = timegm(datetime.fromisoformat(stamp).timetuple())
+            ts.append(time_cache[stamp])
+            dyno.append(intern(source.split("/")[-1]))
+            kind.append(event[0])
+            value.append(event[1])
+            code.append(event[2])
+            text.append(intern(event[3]) if event[3] is not None else -1)
+
+    columns = {
+        "ts": np.array(ts, dtype=np.int64),
+        "dyno": np.array(dyno, dtype=np.int32),
+        "kind": np.array(kind, dtype=np.int8),
+        "value": np.array(value, dtype=np.float64),
+        "code": np.array(code, dtype=np.int32),
+        "text": np.array(text, dtype=np.int32),
+    }
+    return EventTable(columns, strings, lines)
+
+
+def _classify(source, message):
+    """Return (kind, value, code, text) for lines the analysis uses, else None."""
+    if source.startswith("app/"):
+        if "Received event: input_audio_buffer.speech_stopped" in message:
+            return SPEECH_STOPPED, 0.0, 0, None
+        if "Received event: input_audio_buffer.speech_started" in message:
+            return SPEECH_STARTED, 0.0, 0, None
+        if "Received event: response.audio.done" in message:
+            return AUDIO_DONE, 0.0, 0, None
+        if "Query to KB Started" in message or "CustomGPT Started" in message:
+            return RAG_START, 0.0, 0, None
+        if "execution time" in message:
+            match = RAG_TIME_RE.search(message)
+            if match:
+                return RAG_TIME, float(match.group(1)), 0, None
+        if "Latency span::" in message:
+            match = SPAN_RE.search(message)
+            if match:
+                return SPAN, float(match.group(2)), 0, match.group(1)
+        if "Session ID" in message:
+            match = SESSION_START_RE.search(message)
+            if match:
+                return SESSION_START, 0.0, 0, match.group(1)
+            match = SESSION_END_RE.search(message)
+            if match:
+                return SESSION_END, 0.0, 0, match.group(1)
+        if "Incoming stream has started" in message:
+            match = STREAM_START_RE.search(message)
+            if match:
+                return STREAM_START, 0.0, 0, match.group(1)
+        if message.startswith("ERROR:"):
+            return APP_ERROR, 0.0, 0, None
+        return None
+
+    if source == "heroku/router":
+        match = ROUTER_RE.search(message)
+        if match:
+            path = UUID_RE.sub("/:id", match.group(1).split("?")[0])
+            return ROUTER, float(match.group(2)), int(match.group(3)), path
+        return None
+
+    if source.startswith("heroku/"):
+        if "Error R14" in message:
+            return MEMORY_QUOTA, 0.0, 0, None
+        if message.startswith("State changed from up to starting"):
+            return DYNO_RESTART, 0.0, 0, None
+    return None
+
+
+def load_table(path, cache_dir=DEFAULT_CACHE_DIR):
+    """Parse path, or reuse its cached table if the file has not changed."""
+    if not cache_dir:
+        return parse_log_file(path), False
+    stat = os.stat(path)
+    key = hashlib.sha1(
+        f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}:{PARSER_VERSION}".encode()
+    ).hexdigest()
+    cache_path = os.path.join(cache_dir, f"{key}.npz")
+    if os.path.exists(cache_path):
+        return EventTable.load(cache_path), True
+    table = parse_log_file(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    table.save(cache_path)
+    return table, False
+
+
+def iter_log_files(paths):
+    """Expand files and directories into TSV paths, sorted so hours stay in order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names if name.endswith(".tsv"))
+        else:
+            files.append(path)
+    return sorted(files, key=os.path.basename)
+
+
+class LatencyReport:
+    """
+    Correlates events into sessions and turns and aggregates them.
+    - A turn starts at speech_stopped and ends at the next response.audio.done;
+      a speech_started before that marks it interrupted.
+    - response_seconds has the exports' one-second resolution; RAG timings and
+      latency spans carry the app's own sub-second measurements.
+    """
+
+    def __init__(self, slow_turns=10):
+        self.slow_turns = slow_turns
+        self.samples = {}
+        self.router = {}
+        self.counts = {
+            "files": 0,
+            "cached_files": 0,
+            "lines": 0,
+            "events": 0,
+            "sessions": 0,
+            "turns": 0,
+            "interrupted_turns": 0,
+            "ambiguous_events": 0,
+            "app_errors": 0,
+            "dyno_restarts": 0,
+            "memory_quota_errors": 0,
+            "router_5xx": 0,
+        }
+        self._open = {}  # dyno -> [session state, ...] in start order
+        self._slowest = []  # min-heap of (seconds, sequence, turn)
+        self._sequence = 0
+
+    def add_table(self, table, cached=False):
+        self.counts["files"] += 1
+        self.counts["cached_files"] += int(cached)
+        self.counts["lines"] += table.lines
+        self.counts["events"] += len(table)
+
+        columns = table.columns
+        strings = table.strings
+        for ts, dyno_id, kind, value, code, text_id in zip(
+            columns["ts"].tolist(),
+            columns["dyno"].tolist(),
+            columns["kind"].tolist(),
+            columns["value"].tolist(),
+            columns["code"].tolist(),
+            columns["text"].tolist(),
+        ):
+            text = strings[text_id] if text_id >= 0 else None
+            self._handle(ts, strings[dyno_id], kind, value, code, text)
+
+    def _handle(self, ts, dyno, kind, value, code, text):
+        if kind == ROUTER:
+            if code >= 500:
+                self.counts["router_5xx"] += 1
+            if code != 101:  # websocket upgrades last as long as the call
+                self.router.setdefault(text, []).append(value / 1000)
+            return
+        if kind == MEMORY_QUOTA:
+            self.counts["memory_quota_errors"] += 1
+            return
+        if kind == DYNO_RESTART:
+            self.counts["dyno_restarts"] += 1
+            # Calls on a restarting dyno are gone
+            for session in self._open.pop(dyno, []):
+                self._close_turn(session)
+            return
+        if kind == APP_ERROR:
+            self.counts["app_errors"] += 1
+            return
+
+        sessions = self._open.setdefault(dyno, [])
+        if kind == SESSION_START:
+            self.counts["sessions"] += 1
+            sessions.append({"id": text, "stream": None, "started": ts, "turn": None})
+            return
+        if kind == SESSION_END:
+            for session in sessions:
+                if session["id"] == text:
+                    self._close_turn(session)
+                    sessions.remove(session)
+                    break
+            return
+
+        if not sessions:
+            return
+        if len(sessions) > 1:
+            self.counts["ambiguous_events"] += 1
+        session = sessions[-1]
+        turn = session["turn"]
+
+        if kind == STREAM_START:
+            session["stream"] = text
+        elif kind == SPEECH_STOPPED:
+            self._close_turn(session)
+            session["turn"] = {"start": ts, "rag_started": None, "stages": {}}
+        elif turn is None:
+            return
+        elif kind == SPEECH_STARTED:
+            if "response_seconds" not in turn:
+                turn["interrupted"] = True
+        elif kind == RAG_START:
+            turn["rag_started"] = ts
+        elif kind == RAG_TIME:
+            turn["stages"]["rag_total"] = value
+        elif kind == SPAN:
+            turn["stages"][text] = turn["stages"].get(text, 0.0) + value
+        elif kind == AUDIO_DONE and "response_seconds" not in turn:
+            turn["response_seconds"] = float(ts - turn["start"])
+
+    def _close_turn(self, session):
+        turn = session["turn"]
+        session["turn"] = None
+        if turn is None:
+            return
+        self.counts["turns"] += 1
+        if turn.get("interrupted"):
+            self.counts["interrupted_turns"] += 1
+        for stage, seconds in turn["stages"].items():
+            self.samples.setdefault(stage, []).append(seconds)
+        if "response_seconds" in turn:
+            self.samples.setdefault("response_seconds", []).append(turn["response_seconds"])
+
+        turn_seconds = max(turn.get("response_seconds", 0.0), turn["stages"].get("rag_total", 0.0))
+        record = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(turn["start"])),
+            "session": session["id"],
+            "stream": session["stream"],
+            "seconds": turn_seconds,
+            **turn["stages"],
+        }
+        if "response_seconds" in turn:
+            record["response_seconds"] = turn["response_seconds"]
+        self._sequence += 1
+        entry = (turn_seconds, self._sequence, record)
+        if len(self._slowest) < self.slow_turns:
+            heapq.heappush(self._slowest, entry)
+        elif entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def finish(self):
+        for sessions in self._open.values():
+            for session in sessions:
+                self._close_turn(session)
+        self._open = {}
+
+    def summary(self):
+        return {
+            "counts": self.counts,
+            "stages": {stage: _percentiles(values) for stage, values in sorted(self.samples.items())},
+            "router": {path: _percentiles(values) for path, values in sorted(self.router.items())},
+            "slowest_turns": [record for _, _, record in sorted(self._slowest, reverse=True)],
+        }
+
+
+def _percentiles(values):
+    values = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(len(values)),
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "max": float(values.max()),
+    }
+
+
+def analyse(paths, cache_dir=DEFAULT_CACHE_DIR, slow_turns=10):
+    report = LatencyReport(slow_turns=slow_turns)
+    for path in iter_log_files(paths):
+        table, cached = load_table(path, cache_dir)
+        report.add_table(table, cached)
+    report.finish()
+    return report.summary()
+
+
+def format_summary(summary):
+    counts = summary["counts"]
+    lines = [
+        f"Files: {counts['files']} ({counts['cached_files']} cached) | "
+        f"lines: {counts['lines']} | events: {counts['events']}",
+        f"Sessions: {counts['sessions']} | turns: {counts['turns']} "
+        f"({counts['interrupted_turns']} interrupted) | "
+        f"ambiguous events: {counts['ambiguous_events']}",
+        f"App errors: {counts['app_errors']} | dyno restarts: {counts['dyno_restarts']} | "
+        f"R14 memory errors: {counts['memory_quota_errors']} | router 5xx: {counts['router_5xx']}",
+        "",
+        f"{'stage (seconds)':<34}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}",
+    ]
+    for title, section in (("", summary["stages"]), ("router ", summary["router"])):
+        for name, stats in section.items():
+            lines.append(
+                f"{(title + name)[:33]:<34}{stats['count']:>7}{stats['p50']:>9.3f}"
+                f"{stats['p95']:>9.3f}{stats['p99']:>9.3f}{stats['max']:>9.3f}"
+            )
+    if summary["slowest_turns"]:
+        lines += ["", "Slowest turns:"]
+        for turn in summary["slowest_turns"]:
+            details = ", ".join(
+                f"{key}={value:.3f}"
+                for key, value in turn.items()
+                if key not in ("time", "session", "stream", "seconds")
+            )
+            lines.append(f"  {turn['time']}  {turn['seconds']:6.2f}s  {turn['session']}  {details}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Per-turn latency report from Heroku TSV log exports."
+    )
+    parser.add_argument("paths", nargs="+", help="TSV files or directories of them")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true", help="Always re-parse the exports")
+    parser.add_argument("--slow", type=int, default=10, help="Number of slowest turns to list")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    result = analyse(args.paths, None if args.no_cache else args.cache_dir, args.slow)
+    print(json.dumps(result, indent=2) if args.json else format_summary(result))
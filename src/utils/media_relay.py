@@ -0,0 +1,173 @@
+"""
+Hot-path framing for the Twilio <-> OpenAI Realtime audio relay.
+
+Audio payloads are base64 on both legs, so they are forwarded untouched:
+media frames are sliced out of the raw message text and dropped into
+pre-built JSON templates instead of being decoded, re-encoded and
+re-serialised. Base64 and Twilio stream SIDs never need JSON escaping.
+"""
+import json
+import time
+import base64
+import argparse
+
+import orjson
+
+TWILIO_MEDIA_TEMPLATE = '{"event":"media","streamSid":"%s","media":{"payload":"%s"}}'
+OPENAI_APPEND_TEMPLATE = '{"type":"input_audio_buffer.append","audio":"%s"}'
+
+_TWILIO_MEDIA_MARKER = '"event":"media"'
+_TWILIO_PAYLOAD_MARKER = '"payload":"'
+_OPENAI_DELTA_PREFIX = '{"type":"response.audio.delta"'
+_OPENAI_DELTA_MARKER = '"delta":"'
+
+
+def loads(message):
+    """Fast JSON decode for control events."""
+    return orjson.loads(message)
+
+
+def twilio_media_frame(stream_sid, payload):
+    return TWILIO_MEDIA_TEMPLATE % (stream_sid, payload)
+
+
+def openai_audio_append(payload):
+    return OPENAI_APPEND_TEMPLATE % payload
+
+
+def extract_media_payload(message):
+    """Return the base64 payload of a Twilio media frame, or None for other events."""
+    if _TWILIO_MEDIA_MARKER not in message:
+        return None
+    return _slice_string_value(message, _TWILIO_PAYLOAD_MARKER)
+
+
+def extract_audio_delta(message):
+    """Return the base64 delta of a response.audio.delta event, or None otherwise."""
+    if not message.startswith(_OPENAI_DELTA_PREFIX):
+        return None
+    return _slice_string_value(message, _OPENAI_DELTA_MARKER)
+
+
+def _slice_string_value(message, marker):
+    start = message.find(marker)
+    if start < 0:
+        return None
+    start += len(marker)
+    end = message.find('"', start)
+    if end < 0:
+        return None
+    return message[start:end]
+
+
+##############################################################
+######################## BENCHMARK ###########################
+##############################################################
+
+
+def _sample_messages(payload_bytes=160):
+    audio = (bytes(range(256)) * (payload_bytes // 256 + 1))[:payload_bytes]
+    payload = base64.b64encode(audio).decode("utf-8")
+    twilio = json.dumps(
+        {
+            "event": "media",
+            "sequenceNumber": "42",
+            "media": {
+                "track": "inbound",
+                "chunk": "41",
+                "timestamp": "820",
+                "payload": payload,
+            },
+            "streamSid": "MZ18ad3ab5a668481ce02b83e7395059f0",
+        },
+        separators=(",", ":"),
+    )
+    openai = json.dumps(
+        {
+            "type": "response.audio.delta",
+            "event_id": "event_AbCdEf",
+            "response_id": "resp_AbCdEf",
+            "item_id": "item_AbCdEf",
+            "output_index": 0,
+            "content_index": 0,
+            "delta": payload,
+        },
+        separators=(",", ":"),
+    )
+    return twilio, openai
+
+
+def _legacy_inbound(message):
+    data = json.loads(message)
+    if data["event"] == "media":
+        return json.dumps(
+            {"type": "input_audio_buffer.append", "audio": data["media"]["payload"]}
+        )
+
+
+def _legacy_outbound(message, stream_sid):
+    response = json.loads(message)
+    if response["type"] == "response.audio.delta" and response.get("delta"):
+        payload = base64.b64encode(base64.b64decode(response["delta"])).decode("utf-8")
+        return json.dumps(
+            {"event": "media", "streamSid": stream_sid, "media": {"payload": payload}}
+        )
+
+
+def _lean_inbound(message):
+    payload = extract_media_payload(message)
+    if payload is not None:
+        return openai_audio_append(payload)
+
+
+def _lean_outbound(message, stream_sid):
+    delta = extract_audio_delta(message)
+    if delta:
+        return twilio_media_frame(stream_sid, delta)
+
+
+def _frames_per_second(fn, message, *args, seconds=1.0):
+    frames = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(1000):
+            fn(message, *args)
+        frames += 1000
+    return frames / seconds
+
+
+def run_benchmark(seconds=1.0, payload_bytes=160):
+    """Single-core frames/s for each relay direction, legacy vs lean path."""
+    twilio, openai = _sample_messages(payload_bytes)
+    stream_sid = "MZ18ad3ab5a668481ce02b83e7395059f0"
+    return {
+        "inbound_legacy": _frames_per_second(_legacy_inbound, twilio, seconds=seconds),
+        "inbound_lean": _frames_per_second(_lean_inbound, twilio, seconds=seconds),
+        "outbound_legacy": _frames_per_second(
+            _legacy_outbound, openai, stream_sid, seconds=seconds
+        ),
+        "outbound_lean": _frames_per_second(
+            _lean_outbound, openai, stream_sid, seconds=seconds
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the audio relay framing.")
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument(
+        "--payload-bytes",
+        type=int,
+        default=160,
+        help="Decoded audio bytes per frame (160 = 20 ms of 8 kHz μ-law)",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmark(args.seconds, args.payload_bytes)
+    for direction in ("inbound", "outbound"):
+        legacy = results[f"{direction}_legacy"]
+        lean = results[f"{direction}_lean"]
+        print(
+            f"{direction:>8}: legacy {legacy:>12,.0f} frames/s/core | "
+            f"lean {lean:>12,.0f} frames/s/core | {lean / legacy:.1f}x"
+        )
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "pdf_cache"))
+
+# Bump when create_medical_pdf's layout changes so cached files are re-rendered
+RENDER_VERSION = 1
+
+
+class PDFCache:
+    """
+    Rendered summary PDFs, addressed by a hash of the summary they show.
+    - summary_digest() doubles as the HTTP ETag: the same summary always maps
+      to the same bytes, so clients can revalidate without a download.
+    - Files persist in cache_dir ({digest}.pdf) or, if a redis client is
+      passed, in Redis so every worker shares them.
+    - The least recently used entry is evicted once max_entries is reached;
+      a small in-process LRU sits in front of either backend.
+    """
+
+    def __init__(
+        self,
+        cache_dir=DEFAULT_CACHE_DIR,
+        redis_client=None,
+        max_entries=256,
+        ttl_seconds=7 * 86400,
+        namespace="pdf_cache",
+        memory_entries=16,
+    ):
+        self.cache_dir = cache_dir
+        self.redis_client = redis_client
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # digest -> pdf bytes
+
+    # ------------------------------------------------------------------ #
+    # Public API
+    # ------------------------------------------------------------------ #
+    def get(self, digest):
+        """Return the cached PDF bytes for digest, or None on a miss."""
+        with self._lock:
+            pdf_bytes = self._memory.get(digest)
+            if pdf_bytes is not None:
+                self._memory.move_to_end(digest)
+
+        if pdf_bytes is None:
+            if self.redis_client is not None:
+                pdf_bytes = self._redis_get(digest)
+            else:
+                pdf_bytes = self._disk_get(digest)
+            if pdf_bytes is not None:
+                self._remember(digest, pdf_bytes)
+
+        with self._lock:
+            if pdf_bytes is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return pdf_bytes
+
+    def put(self, digest, pdf_bytes):
+        if self.redis_client is not None:
+            self._redis_put(digest, pdf_bytes)
+        else:
+            self._disk_put(digest, pdf_bytes)
+        self._remember(digest, pdf_bytes)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": "redis" if self.redis_client is not None else "disk",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _remember(self, digest, pdf_bytes):
+        with self._lock:
+            self._memory[digest] = pdf_bytes
+            self._memory.move_to_end(digest)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    # ------------------------------------------------------------------ #
+    # Disk backend
+    # ------------------------------------------------------------------ #
+    def _disk_get(self, digest):
+        path = os.path.join(self.cache_dir, f"{digest}.pdf")
+        try:
+            with open(path, "rb") as pdf_file:
+                pdf_bytes = pdf_file.read()
+        except OSError:
+            return None
+        os.utime(path)  # mtime doubles as last-used time for eviction
+        return pdf_bytes
+
+    def _disk_put(self, digest, pdf_bytes):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temporary_path = os.path.join(self.cache_dir, f"{digest}.pdf.tmp")
+        with open(temporary_path, "wb") as pdf_file:
+            pdf_file.write(pdf_bytes)
+        os.replace(temporary_path, os.path.join(self.cache_dir, f"{digest}.pdf"))
+        self._evict_disk()
+
+    def _evict_disk(self):
+        entries = sorted(
+            (os.path.getmtime(os.path.join(self.cache_dir, name)), name)
+            for name in os.listdir(self.cache_dir)
+            if name.endswith(".pdf")
+        )
+        for _, name in entries[: max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------------ #
+    # Redis backend
+    # ------------------------------------------------------------------ #
+    def _index_key(self):
+        return f"{self.namespace}:index"
+
+    def _entry_key(self, digest):
+        return f"{self.namespace}:entry:{digest}"
+
+    def _redis_get(self, digest):
+        pdf_bytes = self.redis_client.get(self._entry_key(digest))
+        if pdf_bytes is None:
+            self.redis_client.zrem(self._index_key(), digest)
+            return None
+        self.redis_client.zadd(self._index_key(), {digest: time.time()})
+        return pdf_bytes
+
+    def _redis_put(self, digest, pdf_bytes):
+        pipe = self.redis_client.pipeline()
+        pipe.set(self._entry_key(digest), pdf_bytes, ex=self.ttl_seconds)
+        pipe.zadd(self._index_key(), {digest: time.time()})
+        pipe.execute()
+
+        overflow = self.redis_client.zcard(self._index_key()) - self.max_entries
+        if overflow > 0:
+            for stale in self.redis_client.zrange(self._index_key(), 0, overflow - 1):
+                stale = stale.decode("utf-8") if isinstance(stale, bytes) else stale
+                self.redis_client.delete(self._entry_key(stale))
+                self.redis_client.zrem(self._index_key(), stale)
+
+
+def etag_matches(if_none_match, digest):
+    """
+    Whether an If-None-Match header covers digest: "*", or any tag of its
+    comma-separated list, weak (W/"...") tags included as RFC 9110 requires.
+    """
+    for tag in (if_none_match or "").split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"') == digest:
+            return True
+    return False
+
+
+def summary_digest(summary):
+    """Stable hash of a stored summary dict and the renderer version."""
+    canonical = json.dumps(summary, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{RENDER_VERSION}\n{canonical}".encode("utf-8")).hexdigest()
@@ -0,0 +1,184 @@
+"""
+Bulk export of conversation summaries as PDFs in one zip archive.
+
+Documents are rendered in a process pool whose workers each parse the logo
+once. Results are written to the archive in submission order, with at most
+max_in_flight renders outstanding, so memory stays bounded however many
+sessions are exported.
+
+    python -m src.utils.pdf_export summaries.zip --caller +15551234567 --limit 500
+    python -m src.utils.pdf_export summaries.zip --sessions-file ids.txt
+    python -m src.utils.pdf_export summaries.zip --jsonl summaries.jsonl
+"""
+import os
+import re
+import json
+import time
+import logging
+import argparse
+import zipfile
+import urllib.parse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import redis
+from dotenv import load_dotenv
+
+from src.utils.pdf_generate import LOGO_PATH, MedicalPDF, build_medical_pdf
+from src.utils.session_store import RedisSessionStore
+
+logger = logging.getLogger(__name__)
+
+# Session ids from a JSONL file are arbitrary text; keep entry names flat and portable
+UNSAFE_NAME_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def export_summaries(summaries, destination, workers=None, max_in_flight=None, logo_path=LOGO_PATH):
+    """
+    Render (session_id, summary) pairs into a zip at destination (a path or
+    writable file object), one conversation-summary-<session_id>.pdf each.
+    Characters outside [A-Za-z0-9._-] in the id become "_", and a repeated id
+    gets a "-2", "-3", ... suffix rather than a second entry of the same name.
+    Returns a report with document, page, duplicate and failure counts and
+    pages/second.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 4
+    report = {"documents": 0, "pages": 0, "bytes": 0, "failed": 0, "duplicates": 0}
+    names = set()
+    started = time.perf_counter()
+
+    # PDFs are already Flate-compressed; deflating them again costs CPU for ~nothing
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(logo_path,)
+    ) as pool, zipfile.ZipFile(destination, "w", compression=zipfile.ZIP_STORED) as archive:
+        pending = deque()
+        for session_id, summary in summaries:
+            pending.append((session_id, pool.submit(_render, summary, logo_path)))
+            if len(pending) >= max_in_flight:
+                _write(archive, *pending.popleft(), report, names)
+        while pending:
+            _write(archive, *pending.popleft(), report, names)
+
+    report["seconds"] = time.perf_counter() - started
+    report["pages_per_second"] = report["pages"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+
+def _init_worker(logo_path):
+    # Lays out one throwaway page so the logo is parsed before the first real job
+    MedicalPDF(logo_path).add_page()
+
+
+def _render(summary, logo_path):
+    pdf = build_medical_pdf(summary, logo_path)
+    return pdf.output(dest="S").encode("latin1"), pdf.page_no()
+
+
+def _write(archive, session_id, future, report, names):
+    try:
+        pdf_bytes, pages = future.result()
+    except Exception as e:
+        logger.error(f"Failed to render summary PDF for {session_id}: {e}")
+        report["failed"] += 1
+        return
+    archive.writestr(_entry_name(session_id, report, names), pdf_bytes)
+    report["documents"] += 1
+    report["pages"] += pages
+    report["bytes"] += len(pdf_bytes)
+
+
+def _entry_name(session_id, report, names):
+    stem = UNSAFE_NAME_RE.sub("_", str(session_id)).strip("._") or "session"
+    name = f"conversation-summary-{stem}"
+    if name in names:
+        report["duplicates"] += 1
+        suffix = 2
+        while f"{name}-{suffix}" in names:
+            suffix += 1
+        name = f"{name}-{suffix}"
+    names.add(name)
+    return f"{name}.pdf"
+
+
+# ---------------------------------------------------------------------- #
+# Summary sources
+# ---------------------------------------------------------------------- #
+def summaries_from_store(session_store, session_ids, missing):
+    """Yield (session_id, summary) from the session store; unknown IDs go to missing."""
+    for session_id in session_ids:
+        summary = session_store.get_summary(session_id)
+        if summary is None:
+            missing.append(session_id)
+            continue
+        yield session_id, summary
+
+
+def summaries_from_jsonl(path):
+    """Yield (session_id, summary) from lines of {"session_id": ..., "summary": ..., ...}."""
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            summary = json.loads(line)
+            yield summary.get("session_id") or f"line-{line_number}", summary
+
+
+def redis_session_store():
+    redis_url = urllib.parse.urlparse(os.environ["REDISCLOUD_URL"])
+    redis_client = redis.Redis(
+        host=redis_url.hostname,
+        port=redis_url.port,
+        password=redis_url.password,
+        ssl=True,
+        ssl_cert_reqs=None,
+    )
+    return RedisSessionStore(redis_client)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(
+        description="Export conversation summaries as PDFs into a zip archive."
+    )
+    parser.add_argument("output", help="Zip file to write")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--session", action="append", help="Session ID (repeatable)")
+    source.add_argument("--sessions-file", help="File with one session ID per line")
+    source.add_argument("--caller", help="Export this caller's most recent sessions")
+    source.add_argument("--jsonl", help="Summaries as JSON lines instead of the session store")
+    parser.add_argument("--since", type=float, help="With --caller: unix time lower bound")
+    parser.add_argument("--until", type=float, help="With --caller: unix time upper bound")
+    parser.add_argument("--limit", type=int, default=100, help="With --caller: max sessions")
+    parser.add_argument("--workers", type=int, default=None, help="Render processes")
+    args = parser.parse_args()
+
+    missing = []
+    if args.jsonl:
+        summaries = summaries_from_jsonl(args.jsonl)
+    else:
+        session_store = redis_session_store()
+        if args.caller:
+            session_ids = [
+                entry["session_id"]
+                for entry in session_store.find_sessions(
+                    args.caller, since=args.since, until=args.until, limit=args.limit
+                )
+            ]
+        elif args.sessions_file:
+            with open(args.sessions_file) as f:
+                session_ids = [line.strip() for line in f if line.strip()]
+        else:
+            session_ids = args.session
+        summaries = summaries_from_store(session_store, session_ids, missing)
+
+    report = export_summaries(summaries, args.output, workers=args.workers)
+    print(
+        f"Exported {report['documents']} summaries ({report['pages']} pages, "
+        f"{report['bytes'] / 1e6:.1f} MB) to {args.output} in {report['seconds']:.1f}s: "
+        f"{report['pages_per_second']:.1f} pages/s, {report['failed']} failed, "
+        f"{report['duplicates']} duplicate IDs renamed, "
+        f"{len(missing)} without a summary."
+    )
@@ -5,6 +5,9 @@ import os
 
 LOGO_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "lambdai.png"))
 
+# Parsed images per process, so each new document does not decode the logo again
+_parsed_images = {}
+
 
 class MedicalPDF(FPDF):
     def __init__(self, logo_path):
@@ -13,7 +16,11 @@ class MedicalPDF(FPDF):
 
     def header(self):
         # Add a logo
+        self._reuse_parsed_image(self.logo_path)
         self.image(self.logo_path, 10, 8, 20)  # Adjust size and position of the logo
+        if self.logo_path not in _parsed_images and self.logo_path in self.images:
+            # Copy: output() drops the image data from the document's own dict
+            _parsed_images[self.logo_path] = dict(self.images[self.logo_path])
         self.set_font("Arial", "B", 14)
         self.set_text_color(0, 0, 0)  # Black text for the title
         self.cell(0, 10, "AI Doctor Conversation Summary", ln=True, align="C")
@@ -22,6 +29,12 @@ class MedicalPDF(FPDF):
         self.line(10, 30, 200, 30)  # Separator line
         self.ln(10)
 
+    def _reuse_parsed_image(self, path):
+        if path in self.images or path not in _parsed_images:
+            return
+        # fpdf numbers images per document; the parsed data itself is shared
+        self.images[path] = dict(_parsed_images[path], i=len(self.images) + 1)
+
     def footer(self):
         self.set_y(-15)
         self.set_font("Arial", "I", 10)
@@ -60,6 +73,13 @@ def extract_text_in_quotes(content):
 
 
 def create_medical_pdf(json_data, logo_path):
+    pdf = build_medical_pdf(json_data, logo_path)
+    pdf_bytes = pdf.output(dest="S").encode("latin1")
+    return pdf_bytes
+
+
+def build_medical_pdf(json_data, logo_path):
+    """Lay out the summary document without serialising it."""
     pdf = MedicalPDF(logo_path)
     pdf.add_page()
 
@@ -85,10 +105,8 @@ def create_medical_pdf(json_data, logo_path):
             if msg["role"] == "user"
             else msg["content"]
         )
-        print(f"Frontend regex successful: {content}")
         pdf.set_font("Arial", "", 12)
         pdf.multi_cell(0, 10, content)
         pdf.ln(2)
 
-    pdf_bytes = pdf.output(dest="S").encode("latin1")
-    return pdf_bytes
+    return pdf
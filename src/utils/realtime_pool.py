@@ -0,0 +1,193 @@
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class RealtimeSessionPool:
+    """
+    Pre-connected OpenAI Realtime websockets with the session config applied.
+    - size sockets are kept open, configured for default_config; a session
+      claimed with another config is reconfigured with one more
+      session.update instead of a new handshake.
+    - Idle sockets older than max_age_seconds are closed and replaced, well
+      before the Realtime API would expire the session.
+    - reserve() claims a socket as soon as the call webhook arrives; the
+      media stream picks it up with session(). A reservation that is not
+      picked up within reserve_timeout (e.g. the stream landed on another
+      worker) is closed.
+    - connect is an async callable returning an open websocket; configure is
+      an async callable (websocket, *config) sending the session.update.
+    """
+
+    def __init__(
+        self,
+        connect,
+        configure,
+        default_config,
+        size=2,
+        max_age_seconds=240.0,
+        reserve_timeout=30.0,
+    ):
+        self.connect = connect
+        self.configure = configure
+        self.default_config = tuple(default_config)
+        self.size = size
+        self.max_age_seconds = max_age_seconds
+        self.reserve_timeout = reserve_timeout
+
+        self._idle = deque()  # (created, config, websocket), oldest first
+        self._reserved = {}  # session_id -> (claim task, expiry handle)
+        self._filling = 0
+        self._wake = None
+        self._task = None
+        self._running = False
+
+        self.hits = 0
+        self.misses = 0
+        self.recycled = 0
+        self.failures = 0
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        self._running = True
+        self._task = asyncio.create_task(self._maintain())
+
+    async def stop(self):
+        self._running = False
+        if self._task is not None:
+            self._wake.set()
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for session_id in list(self._reserved):
+            self._expire_reservation(session_id)
+        while self._idle:
+            await self._close(self._idle.popleft()[2])
+
+    # ------------------------------------------------------------------ #
+    # Claiming
+    # ------------------------------------------------------------------ #
+    async def claim(self, *config):
+        """Return a configured websocket, from the pool when one is ready."""
+        config = config or self.default_config
+        loop = asyncio.get_running_loop()
+        while self._idle:
+            created, pooled_config, websocket = self._idle.popleft()
+            if not websocket.open or loop.time() - created > self.max_age_seconds:
+                self.recycled += 1
+                await self._close(websocket)
+                continue
+            self.hits += 1
+            self._refill()
+            if pooled_config != config:
+                await self.configure(websocket, *config)
+            return websocket
+
+        self.misses += 1
+        self._refill()
+        websocket = await self.connect()
+        await self.configure(websocket, *config)
+        return websocket
+
+    def reserve(self, session_id, *config):
+        """Start claiming a websocket for session_id without waiting for it."""
+        if session_id in self._reserved:
+            return
+        task = asyncio.create_task(self.claim(*config))
+        handle = asyncio.get_running_loop().call_later(
+            self.reserve_timeout, self._expire_reservation, session_id
+        )
+        self._reserved[session_id] = (task, handle)
+
+    @asynccontextmanager
+    async def session(self, session_id, *config):
+        """Yield session_id's reserved websocket, or claim one; closed on exit."""
+        websocket = None
+        reservation = self._reserved.pop(session_id, None)
+        if reservation is not None:
+            task, handle = reservation
+            handle.cancel()
+            try:
+                websocket = await task
+            except Exception as e:
+                logger.warning(f"Reserved Realtime session failed for {session_id}: {e}")
+        if websocket is None or not websocket.open:
+            websocket = await self.claim(*config)
+        try:
+            yield websocket
+        finally:
+            await self._close(websocket)
+
+    def metrics(self):
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "reserved": len(self._reserved),
+            "hits": self.hits,
+            "misses": self.misses,
+            "recycled": self.recycled,
+            "failures": self.failures,
+        }
+
+    # ------------------------------------------------------------------ #
+    # Upkeep
+    # ------------------------------------------------------------------ #
+    def _refill(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _maintain(self):
+        loop = asyncio.get_running_loop()
+        while self._running:
+            # Recycle the oldest sockets before they get close to expiry
+            while self._idle and loop.time() - self._idle[0][0] > self.max_age_seconds:
+                self.recycled += 1
+                await self._close(self._idle.popleft()[2])
+
+            for _ in range(self.size - len(self._idle) - self._filling):
+                self._filling += 1
+                asyncio.create_task(self._add_one())
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=5.0)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _add_one(self):
+        try:
+            websocket = await self.connect()
+            await self.configure(websocket, *self.default_config)
+            if not self._running:
+                await self._close(websocket)
+                return
+            self._idle.append(
+                (asyncio.get_running_loop().time(), self.default_config, websocket)
+            )
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Could not pre-connect a Realtime session: {e}")
+        finally:
+            self._filling -= 1
+
+    def _expire_reservation(self, session_id):
+        reservation = self._reserved.pop(session_id, None)
+        if reservation is None:
+            return
+        task, handle = reservation
+        handle.cancel()
+        task.add_done_callback(self._close_claimed)
+
+    def _close_claimed(self, task):
+        if task.cancelled() or task.exception() is not None:
+            return
+        asyncio.create_task(self._close(task.result()))
+
+    async def _close(self, websocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
@@ -0,0 +1,74 @@
+import numpy as np
+
+from src.utils.chunker import count_tokens
+
+
+def select_context(
+    query_vector,
+    candidates,
+    max_chunks=5,
+    max_tokens=1500,
+    mmr_lambda=0.7,
+    dedupe_threshold=0.95,
+):
+    """
+    Pick the chunks to put in front of the answer model.
+    - candidates are dicts with "payload", "score" (retrieval relevance) and
+      "vector" (the stored embedding, or None for lexical-only hits).
+    - Maximal marginal relevance orders them: relevance minus similarity to
+      what is already chosen, computed with one matrix product.
+    - A candidate whose cosine to a chosen chunk reaches dedupe_threshold is
+      dropped as a near-duplicate.
+    - Chunks are packed greedily into max_tokens; the first always fits.
+    Returns the chosen payloads in selection order.
+    """
+    if not candidates:
+        return []
+
+    relevance = np.array([candidate["score"] for candidate in candidates], dtype=np.float32)
+    if relevance.max() > 0:
+        relevance = relevance / relevance.max()
+
+    similarity = _similarity_matrix(candidates, len(query_vector))
+    chosen = []
+    chosen_tokens = 0
+    max_similarity = np.zeros(len(candidates), dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+
+    while available.any() and len(chosen) < max_chunks:
+        mmr = mmr_lambda * relevance - (1 - mmr_lambda) * max_similarity
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        available[best] = False
+
+        tokens = _token_count(candidates[best]["payload"])
+        if chosen and chosen_tokens + tokens > max_tokens:
+            continue
+        chosen.append(best)
+        chosen_tokens += tokens
+
+        max_similarity = np.maximum(max_similarity, similarity[best])
+        available &= max_similarity < dedupe_threshold
+
+    return [candidates[index]["payload"] for index in chosen]
+
+
+def _similarity_matrix(candidates, dim):
+    """Pairwise cosine; rows without a vector are treated as unrelated."""
+    vectors = np.zeros((len(candidates), dim), dtype=np.float32)
+    for row, candidate in enumerate(candidates):
+        if candidate.get("vector") is not None:
+            vectors[row] = candidate["vector"]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+    return similarity
+
+
+def _token_count(payload):
+    # Ingestion stores the chunker's count; older points are counted here
+    if payload.get("token_count"):
+        return payload["token_count"]
+    return count_tokens(payload["text"])
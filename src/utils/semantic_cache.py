@@ -0,0 +1,220 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on query embeddings.
+    - A lookup hits when a stored query has cosine similarity >= threshold.
+    - Entries expire after ttl_seconds and the least recently used entry is
+      evicted once max_entries is reached.
+    - Passing a redis client shares the cache across workers; otherwise the
+      cache lives in-process. Each worker keeps the Redis vectors as a local
+      matrix and reloads it only when the shared version key changes, so a
+      lookup is one GET plus a matrix product.
+    """
+
+    def __init__(
+        self,
+        threshold=0.95,
+        max_entries=512,
+        ttl_seconds=3600,
+        redis_client=None,
+        namespace="semantic_cache",
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.redis_client = redis_client
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # id -> (vector, answer, expires_at)
+        self._ids = []
+        self._matrix = None
+        self._redis_version = None  # version the local Redis matrix was loaded at
+
+    # ------------------------------------------------------------------ #
+    # Public API
+    # ------------------------------------------------------------------ #
+    def lookup(self, embedding):
+        """Return the cached answer closest to embedding, or None on a miss."""
+        vector = _normalise(embedding)
+        if self.redis_client is not None:
+            answer = self._redis_lookup(vector)
+        else:
+            answer = self._memory_lookup(vector)
+
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return answer
+
+    def store(self, embedding, answer):
+        vector = _normalise(embedding)
+        if self.redis_client is not None:
+            self._redis_store(vector, answer)
+        else:
+            self._memory_store(vector, answer)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": "redis" if self.redis_client is not None else "memory",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": self._size(),
+        }
+
+    # ------------------------------------------------------------------ #
+    # In-memory backend
+    # ------------------------------------------------------------------ #
+    def _memory_lookup(self, vector):
+        with self._lock:
+            self._expire_memory()
+            if not self._entries:
+                return None
+            if self._matrix is None:
+                self._ids = list(self._entries.keys())
+                self._matrix = np.vstack([self._entries[i][0] for i in self._ids])
+
+            scores = self._matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            entry_id = self._ids[best]
+            self._entries.move_to_end(entry_id)
+            return self._entries[entry_id][1]
+
+    def _memory_store(self, vector, answer):
+        with self._lock:
+            self._entries[uuid.uuid4().hex] = (
+                vector,
+                answer,
+                time.time() + self.ttl_seconds,
+            )
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def _expire_memory(self):
+        now = time.time()
+        expired = [key for key, entry in self._entries.items() if entry[2] <= now]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    # ------------------------------------------------------------------ #
+    # Redis backend
+    # ------------------------------------------------------------------ #
+    def _index_key(self):
+        return f"{self.namespace}:index"
+
+    def _entry_key(self, entry_id):
+        return f"{self.namespace}:entry:{entry_id}"
+
+    def _version_key(self):
+        return f"{self.namespace}:version"
+
+    def _redis_lookup(self, vector):
+        ids, matrix = self._redis_matrix()
+        if matrix is None:
+            return None
+
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        entry_id = ids[best]
+        answer = self.redis_client.hget(self._entry_key(entry_id), "answer")
+        if answer is None:
+            # The hash expired via TTL; drop it everywhere on the next reload
+            pipe = self.redis_client.pipeline()
+            pipe.zrem(self._index_key(), entry_id)
+            pipe.incr(self._version_key())
+            pipe.execute()
+            return None
+
+        self.redis_client.zadd(self._index_key(), {entry_id: time.time()})
+        return _decode(answer)
+
+    def _redis_matrix(self):
+        """The (ids, matrix) of stored vectors, reloaded only when the version moved."""
+        version = self.redis_client.get(self._version_key())
+        with self._lock:
+            if version is not None and version == self._redis_version:
+                return self._ids, self._matrix
+
+        ids = [
+            _decode(entry_id)
+            for entry_id in self.redis_client.zrange(self._index_key(), 0, -1)
+        ]
+        pipe = self.redis_client.pipeline()
+        for entry_id in ids:
+            pipe.hget(self._entry_key(entry_id), "vector")
+        raw_vectors = pipe.execute() if ids else []
+
+        live_ids, vectors = [], []
+        for entry_id, raw_vector in zip(ids, raw_vectors):
+            if raw_vector is not None:  # None: hash expired via TTL
+                live_ids.append(entry_id)
+                vectors.append(np.frombuffer(raw_vector, dtype=np.float32))
+        matrix = np.vstack(vectors) if vectors else None
+
+        with self._lock:
+            self._ids, self._matrix, self._redis_version = live_ids, matrix, version
+        return live_ids, matrix
+
+    def _redis_store(self, vector, answer):
+        entry_id = uuid.uuid4().hex
+        pipe = self.redis_client.pipeline()
+        pipe.hset(
+            self._entry_key(entry_id),
+            mapping={"vector": vector.tobytes(), "answer": answer},
+        )
+        pipe.expire(self._entry_key(entry_id), self.ttl_seconds)
+        pipe.zadd(self._index_key(), {entry_id: time.time()})
+        pipe.incr(self._version_key())
+        pipe.zcard(self._index_key())
+        size = pipe.execute()[-1]
+
+        overflow = size - self.max_entries
+        if overflow > 0:
+            evicted = self.redis_client.zpopmin(self._index_key(), overflow)
+            if evicted:
+                pipe = self.redis_client.pipeline()
+                pipe.delete(
+                    *[self._entry_key(_decode(entry_id)) for entry_id, _ in evicted]
+                )
+                pipe.incr(self._version_key())
+                pipe.execute()
+
+    def _size(self):
+        if self.redis_client is not None:
+            try:
+                return self.redis_client.zcard(self._index_key())
+            except Exception:
+                return None
+        return len(self._entries)
+
+
+def _normalise(embedding):
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
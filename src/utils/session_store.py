@@ -0,0 +1,309 @@
+import re
+import json
+import time
+import bisect
+import threading
+
+
+def normalise_phone_number(number):
+    """Reduce a phone number to E.164-ish digits so lookups match Twilio's From."""
+    if not number:
+        return number
+    digits = re.sub(r"\D", "", number)
+    if len(digits) == 10:  # US number without country code
+        digits = "1" + digits
+    return f"+{digits}" if digits else number
+
+
+class InMemorySessionStore:
+    """
+    Per-call state kept in this process.
+    - Every session expires ttl_seconds after its last write.
+    - Only suitable for a single worker; use RedisSessionStore otherwise.
+    """
+
+    def __init__(self, ttl_seconds=86400):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._sessions = {}  # session_id -> {"history": [...], "meta": {...}, ...}
+        self._expires_at = {}
+        self._call_sids = {}  # Twilio CallSid -> session_id
+        self._caller_index = {}  # caller number -> sorted [(started_at, session_id)]
+        self._claims = {}  # (session_id, name) -> (owner, expires_at)
+
+    def init_session(self, session_id, caller_number, initial_history=None):
+        with self._lock:
+            self._sessions[session_id] = {
+                "history": list(initial_history or []),
+                "meta": {"caller_number": caller_number},
+                "summary": None,
+            }
+            self._touch(session_id)
+
+    def append_message(self, session_id, message):
+        with self._lock:
+            self._session(session_id)["history"].append(message)
+            self._touch(session_id)
+
+    def get_history(self, session_id, start=0, end=-1):
+        """Inclusive start/end indexes, with negative values as in LRANGE."""
+        with self._lock:
+            history = self._session(session_id, create=False).get("history", [])
+            end = len(history) + end if end < 0 else end
+            start = max(len(history) + start, 0) if start < 0 else start
+            return list(history[start : end + 1])
+
+    def history_length(self, session_id):
+        with self._lock:
+            return len(self._session(session_id, create=False).get("history", []))
+
+    def get_meta(self, session_id, field, default=None):
+        with self._lock:
+            return self._session(session_id, create=False).get("meta", {}).get(field, default)
+
+    def set_meta(self, session_id, **fields):
+        with self._lock:
+            self._session(session_id)["meta"].update(fields)
+            self._touch(session_id)
+
+    def get_summary(self, session_id):
+        with self._lock:
+            return self._session(session_id, create=False).get("summary")
+
+    def set_summary(self, session_id, summary):
+        with self._lock:
+            self._session(session_id)["summary"] = summary
+            self._touch(session_id)
+
+    def register_call(self, session_id, call_sid, caller_number, started_at=None):
+        started_at = started_at or time.time()
+        caller_number = normalise_phone_number(caller_number)
+        with self._lock:
+            if call_sid:
+                self._call_sids[call_sid] = session_id
+            bisect.insort(
+                self._caller_index.setdefault(caller_number, []), (started_at, session_id)
+            )
+            self._session(session_id)["meta"].update(
+                {"call_sid": call_sid, "started_at": started_at}
+            )
+            self._touch(session_id)
+
+    def claim(self, session_id, name, owner, ttl_seconds):
+        """Take the named lock on session_id for ttl_seconds; False if someone else holds it."""
+        now = time.time()
+        with self._lock:
+            holder = self._claims.get((session_id, name))
+            if holder is not None and holder[1] > now:
+                return False
+            self._claims[(session_id, name)] = (owner, now + ttl_seconds)
+            return True
+
+    def release(self, session_id, name, owner):
+        with self._lock:
+            holder = self._claims.get((session_id, name))
+            if holder is not None and holder[0] == owner:
+                del self._claims[(session_id, name)]
+
+    def get_session_by_call_sid(self, call_sid):
+        with self._lock:
+            session_id = self._call_sids.get(call_sid)
+            return session_id if session_id in self._sessions else None
+
+    def find_sessions(self, caller_number, since=None, until=None, limit=10):
+        """Newest-first [{"session_id", "started_at"}] for a caller within [since, until]."""
+        caller_number = normalise_phone_number(caller_number)
+        with self._lock:
+            self._purge_expired()
+            entries = self._caller_index.get(caller_number, [])
+            lo = bisect.bisect_left(entries, (since,)) if since is not None else 0
+            hi = (
+                bisect.bisect_right(entries, (until, "\uffff"))
+                if until is not None
+                else len(entries)
+            )
+            return [
+                {"session_id": session_id, "started_at": started_at}
+                for started_at, session_id in reversed(entries[lo:hi][-limit:])
+            ]
+
+    def _session(self, session_id, create=True):
+        self._purge_expired()
+        if session_id not in self._sessions:
+            if not create:
+                return {}
+            self._sessions[session_id] = {"history": [], "meta": {}, "summary": None}
+        return self._sessions[session_id]
+
+    def _touch(self, session_id):
+        self._expires_at[session_id] = time.time() + self.ttl_seconds
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = {s for s, t in self._expires_at.items() if t <= now}
+        if not expired:
+            return
+        for session_id in expired:
+            self._sessions.pop(session_id, None)
+            self._expires_at.pop(session_id, None)
+        self._claims = {
+            key: holder for key, holder in self._claims.items() if key[0] not in expired
+        }
+        self._call_sids = {
+            call_sid: session_id
+            for call_sid, session_id in self._call_sids.items()
+            if session_id not in expired
+        }
+        for caller_number in list(self._caller_index):
+            entries = [e for e in self._caller_index[caller_number] if e[1] not in expired]
+            if entries:
+                self._caller_index[caller_number] = entries
+            else:
+                del self._caller_index[caller_number]
+
+
+# Compare-and-delete: an expired claim retaken by another worker is left alone
+RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisSessionStore:
+    """
+    Per-call state in Redis, shared by every worker.
+    - History is an append-only list of JSON messages (RPUSH/LRANGE).
+    - Caller number and other scalars live in a hash; the summary is a JSON string.
+    - Each write is pipelined with an EXPIRE so idle sessions age out.
+    """
+
+    def __init__(self, redis_client, ttl_seconds=86400, prefix="session"):
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def _key(self, session_id, kind):
+        return f"{self.prefix}:{session_id}:{kind}"
+
+    def init_session(self, session_id, caller_number, initial_history=None):
+        pipe = self.redis_client.pipeline()
+        pipe.delete(
+            self._key(session_id, "history"),
+            self._key(session_id, "meta"),
+            self._key(session_id, "summary"),
+        )
+        if initial_history:
+            pipe.rpush(
+                self._key(session_id, "history"),
+                *[json.dumps(message) for message in initial_history],
+            )
+        pipe.hset(
+            self._key(session_id, "meta"),
+            mapping={"caller_number": json.dumps(caller_number)},
+        )
+        self._expire(pipe, session_id, "history", "meta")
+        pipe.execute()
+
+    def append_message(self, session_id, message):
+        pipe = self.redis_client.pipeline()
+        pipe.rpush(self._key(session_id, "history"), json.dumps(message))
+        self._expire(pipe, session_id, "history")
+        pipe.execute()
+
+    def get_history(self, session_id, start=0, end=-1):
+        return [
+            json.loads(message)
+            for message in self.redis_client.lrange(
+                self._key(session_id, "history"), start, end
+            )
+        ]
+
+    def history_length(self, session_id):
+        return self.redis_client.llen(self._key(session_id, "history"))
+
+    def get_meta(self, session_id, field, default=None):
+        value = self.redis_client.hget(self._key(session_id, "meta"), field)
+        if value is None:
+            return default
+        return json.loads(value)
+
+    def set_meta(self, session_id, **fields):
+        pipe = self.redis_client.pipeline()
+        pipe.hset(
+            self._key(session_id, "meta"),
+            mapping={field: json.dumps(value) for field, value in fields.items()},
+        )
+        self._expire(pipe, session_id, "meta")
+        pipe.execute()
+
+    def get_summary(self, session_id):
+        value = self.redis_client.get(self._key(session_id, "summary"))
+        return json.loads(value) if value is not None else None
+
+    def set_summary(self, session_id, summary):
+        self.redis_client.set(
+            self._key(session_id, "summary"), json.dumps(summary), ex=self.ttl_seconds
+        )
+
+    def register_call(self, session_id, call_sid, caller_number, started_at=None):
+        started_at = started_at or time.time()
+        caller_key = f"{self.prefix}:caller:{normalise_phone_number(caller_number)}"
+        pipe = self.redis_client.pipeline()
+        if call_sid:
+            pipe.set(f"{self.prefix}:call:{call_sid}", session_id, ex=self.ttl_seconds)
+        pipe.zadd(caller_key, {session_id: started_at})
+        pipe.zremrangebyscore(caller_key, "-inf", started_at - self.ttl_seconds)
+        pipe.expire(caller_key, self.ttl_seconds)
+        pipe.hset(
+            self._key(session_id, "meta"),
+            mapping={
+                "call_sid": json.dumps(call_sid),
+                "started_at": json.dumps(started_at),
+            },
+        )
+        self._expire(pipe, session_id, "meta")
+        pipe.execute()
+
+    def claim(self, session_id, name, owner, ttl_seconds):
+        """SET NX: exactly one worker gets the lock until it is released or expires."""
+        return bool(
+            self.redis_client.set(
+                self._key(session_id, f"claim:{name}"), owner, nx=True, ex=ttl_seconds
+            )
+        )
+
+    def release(self, session_id, name, owner):
+        """Delete the claim only if owner still holds it, in one atomic script."""
+        self.redis_client.eval(
+            RELEASE_SCRIPT, 1, self._key(session_id, f"claim:{name}"), owner
+        )
+
+    def get_session_by_call_sid(self, call_sid):
+        session_id = self.redis_client.get(f"{self.prefix}:call:{call_sid}")
+        return session_id.decode("utf-8") if isinstance(session_id, bytes) else session_id
+
+    def find_sessions(self, caller_number, since=None, until=None, limit=10):
+        """Newest-first [{"session_id", "started_at"}] for a caller within [since, until]."""
+        entries = self.redis_client.zrevrangebyscore(
+            f"{self.prefix}:caller:{normalise_phone_number(caller_number)}",
+            until if until is not None else "+inf",
+            since if since is not None else "-inf",
+            start=0,
+            num=limit,
+            withscores=True,
+        )
+        return [
+            {
+                "session_id": session_id.decode("utf-8")
+                if isinstance(session_id, bytes)
+                else session_id,
+                "started_at": started_at,
+            }
+            for session_id, started_at in entries
+        ]
+
+    def _expire(self, pipe, session_id, *kinds):
+        for kind in kinds:
+            pipe.expire(self._key(session_id, kind), self.ttl_seconds)
@@ -0,0 +1,172 @@
+import os
+import time
+import uuid
+import asyncio
+import socket
+import logging
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+READY = "ready"
+FAILED = "failed"
+SKIPPED = "skipped"  # nothing was said, so there is nothing to summarise
+
+
+class SummaryJobQueue:
+    """
+    Background asyncio worker pool for end-of-call summaries.
+    - enqueue() returns immediately; a job for a session that is already
+      pending, running or ready is dropped, so each call is summarised once.
+      Across workers the session store's claim (SET NX in Redis) decides
+      which one runs it.
+    - Job status is kept in the session store under "summary_status", with
+      "summary_status_at" and "summary_owner", so any worker can report it.
+      A pending or running job older than stale_after_seconds (its worker
+      died or restarted) can be enqueued again; the claim expires with it.
+    - job is an async callable taking the session_id and returning a truthy
+      value on success, or SKIPPED when the call has nothing to summarise.
+    - on_done, if given, is called with (session_id, status) once a job ends
+      as READY, FAILED or SKIPPED.
+    """
+
+    def __init__(
+        self,
+        job,
+        session_store,
+        workers=2,
+        delay_seconds=2.0,
+        on_done=None,
+        stale_after_seconds=300,
+    ):
+        self.job = job
+        self.session_store = session_store
+        self.workers = workers
+        self.delay_seconds = delay_seconds
+        self.on_done = on_done
+        self.stale_after_seconds = stale_after_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue = None
+        self._tasks = []
+        self._queued = set()
+        self._submissions = set()
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(index)) for index in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def status(self, session_id):
+        return self.session_store.get_meta(session_id, "summary_status")
+
+    def is_stale(self, session_id):
+        """Whether session_id's job is pending or running but its worker has gone quiet."""
+        if self.status(session_id) not in (PENDING, RUNNING):
+            return False
+        updated_at = self.session_store.get_meta(session_id, "summary_status_at", 0)
+        return time.time() - updated_at > self.stale_after_seconds
+
+    def enqueue(self, session_id, force=False):
+        """Schedule a summary for session_id; the store round trips run off the loop."""
+        if session_id in self._queued:
+            return False
+        self._queued.add(session_id)
+        task = asyncio.create_task(self._submit(session_id, force))
+        self._submissions.add(task)
+        task.add_done_callback(self._submissions.discard)
+        return True
+
+    async def requeue_if_stale(self, session_id):
+        """For status readers, so a job lost with its worker is picked up again."""
+        if session_id in self._queued:
+            return False
+        if not await asyncio.to_thread(self.is_stale, session_id):
+            return False
+        logger.warning(f"Summary job for {session_id} went stale, enqueuing it again")
+        return self.enqueue(session_id)
+
+    # ------------------------------------------------------------------ #
+    # Claiming / running
+    # ------------------------------------------------------------------ #
+    def _claim(self, session_id, force):
+        if not force and self.status(session_id) in (READY, SKIPPED):
+            return False
+        if not force and self.status(session_id) in (PENDING, RUNNING):
+            if not self.is_stale(session_id):
+                return False
+        if not self.session_store.claim(
+            session_id, "summary", self.owner, self.stale_after_seconds
+        ):
+            return False
+        # Another worker may have finished between the status check and the claim
+        if not force and self.status(session_id) in (READY, SKIPPED):
+            self.session_store.release(session_id, "summary", self.owner)
+            return False
+        self._set_status(session_id, PENDING)
+        return True
+
+    async def _submit(self, session_id, force):
+        try:
+            claimed = await asyncio.to_thread(self._claim, session_id, force)
+        except Exception as e:
+            logger.error(f"Could not enqueue summary for {session_id}: {e}")
+            claimed = False
+        if not claimed:
+            self._queued.discard(session_id)
+            return
+        # Give the last response.done transcripts time to land in the history
+        await asyncio.sleep(self.delay_seconds)
+        self._queue.put_nowait(session_id)
+
+    def _set_status(self, session_id, summary_status):
+        self.session_store.set_meta(
+            session_id,
+            summary_status=summary_status,
+            summary_status_at=time.time(),
+            summary_owner=self.owner,
+        )
+
+    async def _worker(self, index):
+        while True:
+            session_id = await self._queue.get()
+            outcome = FAILED
+            try:
+                await asyncio.to_thread(self._set_status, session_id, RUNNING)
+                result = await self.job(session_id)
+                if result == SKIPPED:
+                    outcome = SKIPPED
+                else:
+                    outcome = READY if result else FAILED
+                await asyncio.to_thread(self._set_status, session_id, outcome)
+            except asyncio.CancelledError:
+                outcome = None
+                raise
+            except Exception as e:
+                logger.error(f"Summary worker {index} failed for {session_id}: {e}")
+                try:
+                    await asyncio.to_thread(self._set_status, session_id, FAILED)
+                except Exception as e:
+                    logger.error(f"Could not record failed summary for {session_id}: {e}")
+            finally:
+                if outcome is not None:
+                    try:
+                        await asyncio.to_thread(
+                            self.session_store.release, session_id, "summary", self.owner
+                        )
+                    except Exception as e:
+                        logger.error(f"Could not release summary claim for {session_id}: {e}")
+                    if self.on_done is not None:
+                        try:
+                            self.on_done(session_id, outcome)
+                        except Exception as e:
+                            logger.error(f"Summary on_done hook failed for {session_id}: {e}")
+                self._queued.discard(session_id)
+                self._queue.task_done()
@@ -1,79 +1,230 @@
 import os
-from openai import OpenAI
+import glob
+import uuid
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 from dotenv import load_dotenv
-from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, VectorParams
 import pymupdf4llm
 
+from src.utils.chunker import iter_chunks
+from src.utils.clients import ClientRegistry
+from src.utils.embedding_cache import DEFAULT_SQLITE_PATH, EmbeddingCache
+from src.utils.lexical_index import BM25Index
+
 load_dotenv()
 
-client = OpenAI()
-client.api_key = os.getenv("OPENAI_API_KEY")
+KNOWLEDGE_BASE_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "knowledge_base")
+)
+COLLECTION_NAME = "respiratory_disease_guide"
+EMBEDDING_MODEL = "text-embedding-3-small"
+VECTOR_SIZE = 1536
+EMBEDDING_BATCH_SIZE = 64  # inputs per embeddings request
+UPSERT_BATCH_SIZE = 128  # points per upsert request
+CHUNK_MAX_TOKENS = 400
+CHUNK_OVERLAP_TOKENS = 60
+
 
-def split_text_into_chunks(text, max_tokens=1024):
-    chunks = []
-    words = text.split()
-    for i in range(0, len(words), max_tokens):
-        chunk = " ".join(words[i:i+max_tokens])
-        chunks.append(chunk)
-    return chunks
+def extract_pdf(pdf_path):
+    """Runs in a worker process: PDF -> [(page_number, markdown), ...]."""
+    pages = pymupdf4llm.to_markdown(pdf_path, page_chunks=True)
+    return pdf_path, [(page["metadata"]["page"], page["text"]) for page in pages]
 
-pdf_paths = ['./src/utils/knowledge_base/one.pdf', './src/utils/knowledge_base/two.pdf', './src/utils/knowledge_base/three.pdf', 
-             './src/utils/knowledge_base/four.pdf', './src/utils/knowledge_base/five.pdf', './src/utils/knowledge_base/six.pdf',
-             './src/utils/knowledge_base/seven.pdf', './src/utils/knowledge_base/eight.pdf', './src/utils/knowledge_base/nine.pdf',
-             './src/utils/knowledge_base/ten.pdf', './src/utils/knowledge_base/eleven.pdf'
-             ]
 
-for pdf_path in pdf_paths:
-    extracted_text = pymupdf4llm.to_markdown(pdf_path)
-    chunks = split_text_into_chunks(extracted_text)
+def content_hash(text, model=EMBEDDING_MODEL):
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
 
-def get_embedding(text, model="text-embedding-3-small"):
-   text = text.replace("\n", " ")
-   return client.embeddings.create(input = [text], model=model).data[0].embedding
 
-chunk_embeddings = [{"text": chunk, "embedding": get_embedding(chunk)} for chunk in chunks]
+def point_id(source, chunk_hash):
+    # Deterministic id: an unchanged chunk keeps its point across re-runs
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}:{chunk_hash}"))
 
-vectordb_client = QdrantClient(
-    url=os.getenv("QDRANT_URL"), 
-    api_key=os.getenv("QDRANT_API_KEY")
-)
 
-# Uncomment to update knowledge base
-vectordb_client.recreate_collection(
-    collection_name="respiratory_disease_guide",
-    vectors_config={"size": 1536, "distance": "Cosine"}
-)
+def load_chunks(
+    pdf_paths,
+    workers=None,
+    max_tokens=CHUNK_MAX_TOKENS,
+    overlap_tokens=CHUNK_OVERLAP_TOKENS,
+):
+    """Extract every PDF in parallel and chunk it, keeping source, page and offset."""
+    records = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for pdf_path, pages in pool.map(extract_pdf, pdf_paths):
+            source = os.path.basename(pdf_path)
+            for chunk in iter_chunks(pages, max_tokens, overlap_tokens):
+                chunk_hash = content_hash(chunk["text"])
+                records.append(
+                    {
+                        "id": point_id(source, chunk_hash),
+                        "text": chunk["text"],
+                        "payload": {
+                            "text": chunk["text"],
+                            "source": source,
+                            "page": chunk["page"],
+                            "offset": chunk["offset"],
+                            "section": chunk["section"],
+                            "token_count": chunk["token_count"],
+                            "content_hash": chunk_hash,
+                        },
+                    }
+                )
+    return records
+
+
+def get_embeddings(client, texts, model=EMBEDDING_MODEL, embedding_cache=None):
+    """
+    Embed a batch of texts in one request, preserving input order.
+    With an embedding_cache, only texts it has not seen are sent.
+    """
+    if embedding_cache is not None:
+        return embedding_cache.embed(client, texts, model)
+    texts = [" ".join(text.split()) for text in texts]
+    response = client.embeddings.create(input=texts, model=model)
+    return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+
+def get_embedding(client, text, model=EMBEDDING_MODEL, embedding_cache=None):
+    return get_embeddings(client, [text], model=model, embedding_cache=embedding_cache)[0]
+
 
-for idx, chunk in enumerate(chunk_embeddings):
-    vectordb_client.upsert(
-        collection_name="respiratory_disease_guide",
-        points=[{
-            "id": idx,  # Use the integer directly
-            "vector": chunk["embedding"],
-            "payload": {"text": chunk["text"]}
-        }]
+def batched(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def ensure_collection(vectordb_client, collection_name, recreate=False):
+    if recreate:
+        vectordb_client.recreate_collection(
+            collection_name=collection_name,
+            vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE),
+        )
+    elif not vectordb_client.collection_exists(collection_name):
+        vectordb_client.create_collection(
+            collection_name=collection_name,
+            vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE),
+        )
+
+
+def existing_point_sources(vectordb_client, collection_name):
+    """Map every stored point id to the source file it was indexed from."""
+    sources = {}
+    offset = None
+    while True:
+        points, offset = vectordb_client.scroll(
+            collection_name=collection_name,
+            limit=1024,
+            offset=offset,
+            with_payload=["source"],
+            with_vectors=False,
+        )
+        for point in points:
+            sources[str(point.id)] = (point.payload or {}).get("source")
+        if offset is None:
+            return sources
+
+
+def ingest(
+    client,
+    vectordb_client,
+    pdf_paths,
+    collection_name=COLLECTION_NAME,
+    recreate=False,
+    workers=None,
+    embedding_concurrency=4,
+    prune_all=False,
+    max_tokens=CHUNK_MAX_TOKENS,
+    overlap_tokens=CHUNK_OVERLAP_TOKENS,
+    embedding_cache=None,
+):
+    """
+    Index pdf_paths into collection_name.
+    - Chunks whose content hash is already stored are skipped.
+    - With an embedding_cache, chunks embedded by an earlier run (e.g. before
+      --recreate) reuse the stored vector instead of a new request.
+    - Points from the indexed PDFs whose chunk no longer exists are deleted;
+      with prune_all, every point outside this run is deleted.
+    Returns a dict of counts for reporting.
+    """
+    ensure_collection(vectordb_client, collection_name, recreate=recreate)
+    records = load_chunks(
+        pdf_paths, workers=workers, max_tokens=max_tokens, overlap_tokens=overlap_tokens
     )
 
+    # The same chunk text can repeat inside one document; index it once
+    records = list({record["id"]: record for record in records}.values())
+    current_ids = {record["id"] for record in records}
+    indexed_sources = {os.path.basename(path) for path in pdf_paths}
+    stored = existing_point_sources(vectordb_client, collection_name)
+    pending = [record for record in records if record["id"] not in stored]
+    stale_ids = [
+        stored_id
+        for stored_id, source in stored.items()
+        if stored_id not in current_ids and (prune_all or source in indexed_sources)
+    ]
+
+    batches = list(batched(pending, EMBEDDING_BATCH_SIZE))
+    # Deltas, so a cache shared with earlier runs reports this run only
+    requests_before = embedding_cache.requests if embedding_cache is not None else 0
+    hits_before = embedding_cache.hits if embedding_cache is not None else 0
+    with ThreadPoolExecutor(max_workers=embedding_concurrency) as pool:
+        embedded = pool.map(
+            lambda batch: get_embeddings(
+                client, [record["text"] for record in batch], embedding_cache=embedding_cache
+            ),
+            batches,
+        )
+        points = [
+            PointStruct(id=record["id"], vector=vector, payload=record["payload"])
+            for batch, vectors in zip(batches, embedded)
+            for record, vector in zip(batch, vectors)
+        ]
+
+    for batch in batched(points, UPSERT_BATCH_SIZE):
+        vectordb_client.upsert(collection_name=collection_name, points=batch, wait=True)
+
+    if stale_ids:
+        vectordb_client.delete(
+            collection_name=collection_name, points_selector=stale_ids, wait=True
+        )
+
+    return {
+        "chunks": len(records),
+        "embedded": len(points),
+        "unchanged": len(records) - len(pending),
+        "deleted": len(stale_ids),
+        "embedding_requests": embedding_cache.requests - requests_before
+        if embedding_cache is not None
+        else len(batches),
+        "embedding_cache_hits": embedding_cache.hits - hits_before
+        if embedding_cache is not None
+        else 0,
+    }
+
+
 # retrieval
-def query_qdrant(query_text):
-    query_embedding = get_embedding(query_text)
+def query_qdrant(client, vectordb_client, query_text, collection_name=COLLECTION_NAME):
+    query_embedding = get_embedding(client, query_text)
     search_result = vectordb_client.search(
-        collection_name="respiratory_disease_guide",
+        collection_name=collection_name,
         query_vector=query_embedding,
         limit=5
     )
     return [hit.payload["text"] for hit in search_result]
 
-def rag_system(user_query):
-    retrieved_contexts = query_qdrant(user_query)
+
+def rag_system(client, vectordb_client, user_query):
+    retrieved_contexts = query_qdrant(client, vectordb_client, user_query)
     context_text = "\n".join(retrieved_contexts)
-    
+
     messages = [
         {"role": "system", "content": "You are an AI doctor specializing in respiratory diseases. Respond to the user in a professional and conversational way. Provide clear, empathetic, and helpful guidance. Not too structured."},
         {"role": "system", "content": f"Retrieved Context: {context_text}"},
         {"role": "user", "content": user_query}
     ]
-    
+
     # Generate the response using ChatCompletion endpoint
     response = client.chat.completions.create(
         model="gpt-4o-mini",
@@ -84,15 +235,72 @@ def rag_system(user_query):
 
     return response.choices[0].message.content.strip()
 
-user_query = "I have a fever"
-response = rag_system(user_query)
-print(response)
 
-### CHECKER
-# def check_number_of_points(vectordb_client, collection_name):
-#     count = vectordb_client.count(collection_name=collection_name).count
-#     return count
+def main():
+    parser = argparse.ArgumentParser(
+        description="Index the knowledge base PDFs into Qdrant."
+    )
+    parser.add_argument(
+        "pdfs", nargs="*", help="PDF files to index (default: every PDF in knowledge_base/)"
+    )
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument(
+        "--recreate", action="store_true", help="Drop the collection and reindex everything"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="PDF extraction processes")
+    parser.add_argument("--chunk-tokens", type=int, default=CHUNK_MAX_TOKENS)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP_TOKENS)
+    parser.add_argument("--query", help="Run a test RAG query after indexing")
+    parser.add_argument(
+        "--embedding-cache",
+        default=DEFAULT_SQLITE_PATH,
+        help="SQLite file of previously computed embeddings (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-embedding-cache", action="store_true", help="Embed every pending chunk"
+    )
+    args = parser.parse_args()
+
+    pdf_paths = args.pdfs or sorted(glob.glob(os.path.join(KNOWLEDGE_BASE_DIR, "*.pdf")))
+
+    clients = ClientRegistry.from_env()
+    client = clients.openai()
+    vectordb_client = clients.qdrant()
+    embedding_cache = (
+        None if args.no_embedding_cache else EmbeddingCache(sqlite_path=args.embedding_cache)
+    )
+
+    report = ingest(
+        client,
+        vectordb_client,
+        pdf_paths,
+        collection_name=args.collection,
+        recreate=args.recreate,
+        workers=args.workers,
+        prune_all=not args.pdfs,
+        max_tokens=args.chunk_tokens,
+        overlap_tokens=args.chunk_overlap,
+        embedding_cache=embedding_cache,
+    )
+    print(
+        f"Indexed {report['chunks']} chunks from {len(pdf_paths)} PDFs into "
+        f"'{args.collection}': {report['embedded']} embedded in "
+        f"{report['embedding_requests']} requests ({report['embedding_cache_hits']} from "
+        f"the embedding cache), {report['unchanged']} unchanged, "
+        f"{report['deleted']} deleted."
+    )
+
+    # Rebuild the BM25 index over the whole collection, not only this run's PDFs
+    lexical_index = BM25Index.from_qdrant(vectordb_client, args.collection)
+    lexical_index.save()
+    print(
+        f"Built lexical index: {len(lexical_index)} chunks, "
+        f"{lexical_index.meta['terms']} terms."
+    )
+
+    if args.query:
+        print(rag_system(client, vectordb_client, args.query))
+
 
-# collection_name = "respiratory_disease_guide"
-# number_of_points = check_number_of_points(vectordb_client, collection_name)
-# print(f"The collection '{collection_name}' contains {number_of_points} points.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()